@@ -0,0 +1,73 @@
+import sys
+import os
+import json
+import time
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.rag import RAGPipeline
+from backend.local_model import local_models
+
+def count_forward_passes(model):
+    """Attaches a forward hook counting TinyLlama forward passes (= decode steps)."""
+    counter = {"calls": 0}
+
+    def hook(module, inputs, output):
+        counter["calls"] += 1
+
+    handle = model.register_forward_hook(hook)
+    return counter, handle
+
+def benchmark_mode(prompts, assist):
+    total_tokens, total_steps, total_seconds = 0, 0, 0.0
+
+    for prompt in prompts:
+        counter, handle = count_forward_passes(local_models.llm_model)
+        try:
+            start = time.perf_counter()
+            text = "".join(local_models.generate_response_stream(prompt, assist=assist))
+            total_seconds += time.perf_counter() - start
+        finally:
+            handle.remove()
+
+        total_tokens += len(local_models.tokenizer(text, add_special_tokens=False).input_ids)
+        # The first forward pass is prefill; every later pass is one verification step
+        total_steps += max(counter["calls"] - 1, 1)
+
+    return {
+        "tokens": total_tokens,
+        "steps": total_steps,
+        "accepted_tokens_per_step": total_tokens / total_steps if total_steps else 0.0,
+        "tokens_per_sec": total_tokens / total_seconds if total_seconds else 0.0,
+        "seconds": total_seconds,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark assisted generation modes on the golden dataset.")
+    parser.add_argument("--modes", nargs="+", default=["none", "prompt_lookup", "draft"])
+    parser.add_argument("--limit", type=int, default=5, help="Number of golden queries to use")
+    args = parser.parse_args()
+
+    dataset_path = os.path.join(os.path.dirname(__file__), "evaluation", "golden_dataset.json")
+    with open(dataset_path, "r") as f:
+        dataset = json.load(f)[:args.limit]
+
+    rag = RAGPipeline()
+    rag.load_vector_store()
+    prompts = [rag.build_prompt(rag.retrieve(e["query"]), e["query"]) for e in dataset]
+
+    # Warm-up so lazy kernels don't skew the first mode
+    "".join(local_models.generate_response_stream(prompts[0]))
+
+    print(f"🚀 Benchmarking assisted generation on {len(prompts)} prompts...\n")
+    for mode in args.modes:
+        assist = None if mode == "none" else mode
+        result = benchmark_mode(prompts, assist)
+        print(f"🔹 {mode}: {result['tokens_per_sec']:.2f} tok/s, "
+              f"{result['accepted_tokens_per_step']:.2f} tokens/step "
+              f"({result['tokens']} tokens in {result['steps']} steps, {result['seconds']:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.resources import available_cpus
+
+# Thread-count sweep for CPU inference. Every configuration runs in a fresh process, because
+# torch inter-op threads and core affinity can only be set before the first parallel work.
+
+PROMPT = "You are Delores, a helpful assistant for Irembo services.\nQuestion: How do I apply for a passport?\n\nAnswer:"
+EMBED_TEXTS = ["To apply for a passport, log in to Irembo, choose the service and pay the fee."] * 32
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, int(round(pct / 100.0 * len(ordered))) - 1)]
+
+def run_worker(concurrency, requests, max_new_tokens):
+    """Measures generation, embeddings and FAISS under the thread settings in the environment."""
+    from backend.local_model import local_models
+    from backend.rag import RAGPipeline
+    from backend.resources import effective_config
+    import numpy as np
+
+    rag = RAGPipeline()
+    rag.load_vector_store()
+    local_models.generate_response(PROMPT, max_new_tokens=4)  # warm-up
+
+    def one_request(_):
+        start = time.perf_counter()
+        text = local_models.generate_response(PROMPT, max_new_tokens=max_new_tokens, stop_sequences=[])
+        elapsed = time.perf_counter() - start
+        return elapsed, len(local_models.tokenizer(text, add_special_tokens=False).input_ids)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(requests)))
+    wall = time.perf_counter() - start
+    latencies = [r[0] * 1000 for r in results]
+
+    start = time.perf_counter()
+    rag.embeddings.embed_documents(EMBED_TEXTS)
+    embed_ms = (time.perf_counter() - start) * 1000
+
+    faiss_ms = None
+    if rag.vector_store:
+        index = rag.vector_store.index
+        queries = np.random.rand(64, index.d).astype(np.float32)
+        start = time.perf_counter()
+        index.search(queries, 5)
+        faiss_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "effective": effective_config(),
+        "tokens_per_s": sum(r[1] for r in results) / wall,
+        "latency_ms": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95)},
+        "embed_32_ms": embed_ms,
+        "faiss_64_queries_ms": faiss_ms,
+    }
+
+def sweep(thread_grid, faiss_grid, concurrency_grid, requests, max_new_tokens):
+    results = []
+    for concurrency in concurrency_grid:
+        for torch_threads in thread_grid:
+            for faiss_threads in faiss_grid:
+                env = dict(os.environ, DELORES_TORCH_THREADS=str(torch_threads), DELORES_FAISS_THREADS=str(faiss_threads))
+                cmd = [sys.executable, os.path.abspath(__file__), "--worker",
+                       "--concurrency", str(concurrency), "--requests", str(requests), "--max-new-tokens", str(max_new_tokens)]
+                print(f"🔹 torch={torch_threads} faiss={faiss_threads} concurrency={concurrency}")
+                output = subprocess.run(cmd, env=env, capture_output=True, text=True)
+                if output.returncode != 0:
+                    print(f"   ❌ failed: {output.stderr.strip().splitlines()[-1:]}")
+                    continue
+                result = json.loads(output.stdout.strip().splitlines()[-1])
+                result.update(torch_threads=torch_threads, faiss_threads=faiss_threads, concurrency=concurrency)
+                results.append(result)
+                print(f"   {result['tokens_per_s']:.1f} tok/s | p95 {result['latency_ms']['p95']:.0f}ms | "
+                      f"embed {result['embed_32_ms']:.0f}ms | faiss {result['faiss_64_queries_ms'] or 0:.1f}ms")
+    return results
+
+def main():
+    cpus = available_cpus()
+    default_threads = sorted({1, 2, max(1, cpus // 2), cpus})
+
+    parser = argparse.ArgumentParser(description="Find the best thread settings for CPU inference on this machine.")
+    parser.add_argument("--threads", nargs="+", type=int, default=default_threads, help="torch intra-op thread counts")
+    parser.add_argument("--faiss-threads", nargs="+", type=int, default=[1, cpus])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2], help="Concurrent generation requests")
+    parser.add_argument("--requests", type=int, default=4)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--output", help="Write all results as JSON")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.concurrency[0], args.requests, args.max_new_tokens)))
+        return
+
+    print(f"📊 Thread sweep on {cpus} available cores\n")
+    results = sweep(args.threads, sorted(set(args.faiss_threads)), args.concurrency, args.requests, args.max_new_tokens)
+    if not results:
+        sys.exit(1)
+
+    print("\n🏆 Best settings per concurrency level:")
+    for concurrency in args.concurrency:
+        runs = [r for r in results if r["concurrency"] == concurrency]
+        if not runs:
+            continue
+        best = max(runs, key=lambda r: r["tokens_per_s"])
+        steadiest = min(runs, key=lambda r: r["latency_ms"]["p95"])
+        print(f"   concurrency={concurrency}: throughput -> DELORES_TORCH_THREADS={best['torch_threads']} "
+              f"DELORES_FAISS_THREADS={best['faiss_threads']} ({best['tokens_per_s']:.1f} tok/s); "
+              f"p95 latency -> DELORES_TORCH_THREADS={steadiest['torch_threads']} ({steadiest['latency_ms']['p95']:.0f}ms)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import sqlite3
+import hashlib
+from datetime import datetime
+import os
+
+# Use absolute path relative to this file to avoid CWD confusion
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "caption_cache.db")
+# Keys per IN (...) query, well under SQLite's bound-variable limit
+LOOKUP_BATCH = 500
+
+def image_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+class CaptionCache:
+    """
+    Persistent BLIP caption cache.
+    Captions are keyed by the SHA-256 of the image bytes; a URL -> hash table lets
+    repeat URLs skip the download as well as the captioning.
+    """
+
+    def __init__(self, db_path=CACHE_PATH):
+        self.db_path = db_path
+        self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS captions (
+                image_hash TEXT PRIMARY KEY,
+                caption TEXT,
+                created DATETIME
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS image_urls (
+                url TEXT PRIMARY KEY,
+                image_hash TEXT
+            )
+        ''')
+        # Earlier versions cached BLIP failures as a caption; drop them so those images are retried
+        cursor.execute("DELETE FROM captions WHERE caption = 'Image could not be processed.'")
+
+        conn.commit()
+        conn.close()
+
+    def get_by_urls(self, urls: list) -> dict:
+        """Returns {url: caption} for every URL already captioned."""
+        if not urls:
+            return {}
+        urls = list(urls)
+        found = {}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        for i in range(0, len(urls), LOOKUP_BATCH):
+            batch = urls[i:i + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(f'''
+                SELECT u.url, c.caption FROM image_urls u
+                JOIN captions c ON c.image_hash = u.image_hash
+                WHERE u.url IN ({placeholders})
+            ''', batch)
+            found.update(cursor.fetchall())
+        conn.close()
+        return found
+
+    def get_by_hashes(self, hashes: list) -> dict:
+        """Returns {image_hash: caption} for every hash already captioned."""
+        if not hashes:
+            return {}
+        hashes = list(hashes)
+        found = {}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        for i in range(0, len(hashes), LOOKUP_BATCH):
+            batch = hashes[i:i + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(f"SELECT image_hash, caption FROM captions WHERE image_hash IN ({placeholders})", batch)
+            found.update(cursor.fetchall())
+        conn.close()
+        return found
+
+    def put_many(self, entries: list):
+        """Stores (url, image_hash, caption) triples. caption=None only records the URL mapping."""
+        if not entries:
+            return
+        now = datetime.now().isoformat()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany("INSERT OR REPLACE INTO image_urls (url, image_hash) VALUES (?, ?)",
+                           [(url, h) for url, h, _ in entries])
+        cursor.executemany("INSERT OR IGNORE INTO captions (image_hash, caption, created) VALUES (?, ?, ?)",
+                           [(h, caption, now) for _, h, caption in entries if caption is not None])
+        conn.commit()
+        conn.close()
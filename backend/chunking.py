@@ -0,0 +1,150 @@
+import os
+import re
+from langchain_core.documents import Document
+
+# Structure-aware chunking for help-center articles.
+# extract_article marks headings with "#" and numbers ordered-list items, and build_article appends
+# image captions under "--- Visual Context ---". Chunks follow that structure: a chunk never starts
+# mid-step, sections start new chunks, and sizes are counted in tokens of the embedding model
+# (all-MiniLM-L6-v2 truncates its input at 256 word pieces, so longer chunks are partly invisible to it).
+
+CHUNK_STRATEGIES = ("recursive", "structure")
+CHUNK_STRATEGY = os.getenv("DELORES_CHUNK_STRATEGY", "structure")
+STRUCTURE_MAX_TOKENS = 200
+# A chunk smaller than this keeps absorbing the next section instead of standing alone
+STRUCTURE_MIN_TOKENS = 60
+
+HEADING_PATTERN = re.compile(r"^(#{1,4})\s+(.*)$")
+STEP_PATTERN = re.compile(r"^(\d+[.)]|step\s+\d+|étape\s+\d+|intambwe\s+ya\s+\d+)\s*", re.IGNORECASE)
+VISUAL_CONTEXT_MARKER = "--- Visual Context ---"
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+_tokenizer = None
+
+def count_tokens(text):
+    """Length in word pieces of the embedding model (special tokens excluded)."""
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+        from .snapshot import model_path
+        _tokenizer = AutoTokenizer.from_pretrained(model_path("embedding"))
+    return len(_tokenizer.encode(text, add_special_tokens=False))
+
+def parse_blocks(text):
+    """
+    Splits article text into (section_path, block_text) pieces, in order.
+    A block is a run of consecutive steps (kept together) or a single other line.
+    """
+    path = []  # [(level, heading)]
+    blocks = []
+    steps = []
+
+    def current_path():
+        return tuple(heading for _, heading in path)
+
+    def flush_steps():
+        if steps:
+            blocks.append((current_path(), "\n".join(steps)))
+            steps.clear()
+
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if line == VISUAL_CONTEXT_MARKER:
+            flush_steps()
+            path = [(1, "Visual Context")]
+            continue
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            flush_steps()
+            level = len(heading.group(1))
+            path = [(l, h) for l, h in path if l < level] + [(level, heading.group(2).strip())]
+            continue
+        if STEP_PATTERN.match(line):
+            steps.append(line)
+            continue
+        if steps:
+            # Inline markup (<strong>, links) inside a step comes out on its own lines,
+            # so everything up to the next heading stays with the step list
+            steps.append(line)
+            continue
+        flush_steps()
+        blocks.append((current_path(), line))
+    flush_steps()
+    return blocks
+
+def split_oversized(text, max_tokens):
+    """Breaks a block that alone exceeds max_tokens: between lines, then sentences, then words."""
+    pieces = []
+    for unit_pattern in ("\n", SENTENCE_PATTERN, " "):
+        units = text.split(unit_pattern) if isinstance(unit_pattern, str) else unit_pattern.split(text)
+        if len(units) > 1:
+            break
+    joiner = "\n" if unit_pattern == "\n" else " "
+
+    current, current_tokens = [], 0
+    for unit in units:
+        unit_tokens = count_tokens(unit)
+        if unit_tokens > max_tokens and unit_pattern != " ":
+            if current:
+                pieces.append(joiner.join(current))
+                current, current_tokens = [], 0
+            pieces.extend(split_oversized(unit, max_tokens))
+            continue
+        if current and current_tokens + unit_tokens > max_tokens:
+            pieces.append(joiner.join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        pieces.append(joiner.join(current))
+    return pieces
+
+def chunk_text(text, title=None, max_tokens=STRUCTURE_MAX_TOKENS, min_tokens=STRUCTURE_MIN_TOKENS):
+    """
+    Packs blocks greedily into chunks of at most max_tokens.
+    Returns [(section_path, chunk_text)]; the path is the one of the chunk's first block.
+    """
+    # Room for the "Title > Section" header that prefixes every chunk
+    header_budget = count_tokens(title) + 16 if title else 16
+    budget = max(32, max_tokens - header_budget)
+
+    chunks = []
+    current, current_tokens, current_path, last_path = [], 0, None, None
+    for path, block in parse_blocks(text):
+        block_tokens = count_tokens(block)
+        pieces = [block] if block_tokens <= budget else split_oversized(block, budget)
+        for piece in pieces:
+            piece_tokens = block_tokens if len(pieces) == 1 else count_tokens(piece)
+            new_section = path != last_path and current_tokens >= min_tokens
+            if current and (new_section or current_tokens + piece_tokens > budget):
+                chunks.append((current_path, "\n".join(current)))
+                current, current_tokens = [], 0
+            if not current:
+                current_path = path
+            current.append(piece)
+            current_tokens += piece_tokens
+            last_path = path
+    if current:
+        chunks.append((current_path, "\n".join(current)))
+    return chunks
+
+def split_documents(documents, max_tokens=STRUCTURE_MAX_TOKENS, min_tokens=STRUCTURE_MIN_TOKENS):
+    """
+    Structure-aware replacement for RecursiveCharacterTextSplitter.split_documents.
+    Each chunk starts with a "Title > Section" line (so the embedding sees where it comes from)
+    and carries "section", "chunk_index" and "has_header" metadata next to the article's own.
+    """
+    split_docs = []
+    for doc in documents:
+        title = doc.metadata.get("title")
+        for index, (path, body) in enumerate(chunk_text(doc.page_content, title, max_tokens, min_tokens)):
+            section = " > ".join(path)
+            header = " > ".join(p for p in (title, section) if p)
+            content = f"{header}\n{body}" if header else body
+            split_docs.append(Document(
+                page_content=content,
+                metadata=dict(doc.metadata, section=section, chunk_index=index, has_header=bool(header))
+            ))
+    return split_docs
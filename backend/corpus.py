@@ -0,0 +1,104 @@
+import sqlite3
+import hashlib
+import gzip
+import json
+import os
+from datetime import datetime
+
+from .extraction import extract_article
+
+# Raw page corpus: gzipped HTML stored content-addressed under objects/, plus a SQLite
+# manifest of what was fetched from where. Lets extraction/chunking be replayed offline.
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+def object_path(root, sha):
+    return os.path.join(root, "objects", sha[:2], f"{sha}.html.gz")
+
+def read_object(root, sha) -> bytes:
+    with gzip.open(object_path(root, sha), "rb") as f:
+        return f.read()
+
+class CorpusStore:
+    def __init__(self, root=CORPUS_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.db_path = os.path.join(root, "manifest.db")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                final_url TEXT,
+                sha256 TEXT,
+                kind TEXT,
+                site TEXT,
+                fetched_at DATETIME,
+                headers TEXT,
+                meta TEXT
+            )
+        ''')
+        # Manifests created before the meta column existed
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(pages)")]
+        if "meta" not in columns:
+            cursor.execute("ALTER TABLE pages ADD COLUMN meta TEXT")
+
+        conn.commit()
+        conn.close()
+
+    def object_path(self, sha):
+        return object_path(self.root, sha)
+
+    def put(self, url, final_url, content: bytes, headers=None, kind="page", site=None, meta=None) -> str:
+        """
+        Stores a fetched page (deduplicated by content hash) and records it in the manifest.
+        meta: crawl context such as {"category", "folder"}.
+        """
+        sha = hashlib.sha256(content).hexdigest()
+        path = self.object_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO pages (url, final_url, sha256, kind, site, fetched_at, headers, meta)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (url, final_url, sha, kind, site, datetime.now().isoformat(),
+              json.dumps(dict(headers or {})), json.dumps(meta or {})))
+        conn.commit()
+        conn.close()
+        return sha
+
+    def get_html(self, sha) -> bytes:
+        return read_object(self.root, sha)
+
+    def pages(self, kind=None, site=None) -> list:
+        """Manifest rows as dicts, optionally filtered by kind ("article", "listing") and site."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        query = "SELECT * FROM pages WHERE 1=1"
+        params = []
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        if site:
+            query += " AND site = ?"
+            params.append(site)
+        cursor.execute(query + " ORDER BY fetched_at", params)
+        rows = [dict(r) for r in cursor.fetchall()]
+        conn.close()
+        return rows
+
+def extract_stored_page(root, sha, final_url):
+    """Process-pool entry point: reads one stored page from disk and runs the article extractor."""
+    return extract_article(read_object(root, sha), final_url)
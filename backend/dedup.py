@@ -0,0 +1,97 @@
+import re
+import hashlib
+import numpy as np
+
+# Near-duplicate detection with 64-bit SimHash over word 3-gram shingles.
+# The FreshDesk portals republish the same articles (and the homepage is crawled on every site),
+# so identical or lightly edited texts are collapsed into one canonical document/chunk that
+# lists every URL it was found at in metadata["source_urls"].
+
+SIMHASH_BITS = 64
+# Max differing bits for two texts to count as near-duplicates (~95%+ shared shingles)
+SIMHASH_THRESHOLD = 3
+# Banding for candidate lookup: with threshold < BANDS, two near-duplicates share at least one band
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+FINGERPRINT_MASK = (1 << SIMHASH_BITS) - 1
+SHINGLE_SIZE = 3
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+def simhash(text):
+    features = shingles(text)
+    if not features:
+        return 0
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little") for f in features],
+        dtype=np.uint64
+    )
+    bits = (hashes[:, None] >> np.arange(SIMHASH_BITS, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0) * 2 > len(features)
+    # Python ints: 1 << np.int64(63) would overflow into a negative fingerprint
+    return sum(1 << int(i) for i in np.flatnonzero(votes))
+
+def hamming(a, b):
+    return bin((a ^ b) & FINGERPRINT_MASK).count("1")
+
+def to_sqlite(fingerprint):
+    """SQLite INTEGER is a signed 64-bit value; fingerprints with bit 63 set are stored negative."""
+    return fingerprint - (1 << SIMHASH_BITS) if fingerprint >> (SIMHASH_BITS - 1) else fingerprint
+
+def from_sqlite(value):
+    return value & FINGERPRINT_MASK
+
+def _bands(fingerprint):
+    mask = (1 << BAND_BITS) - 1
+    return [(i, (fingerprint >> (i * BAND_BITS)) & mask) for i in range(BANDS)]
+
+def _merge_into(canonical, duplicate):
+    meta = canonical.metadata
+    for url in duplicate.metadata.get("source_urls") or [duplicate.metadata.get("source")]:
+        if url and url not in meta["source_urls"]:
+            meta["source_urls"].append(url)
+    product = duplicate.metadata.get("product")
+    if product and product not in meta["products"]:
+        meta["products"].append(product)
+
+def dedup_documents(documents, threshold=SIMHASH_THRESHOLD):
+    """
+    Keeps the first of every group of near-identical documents (Documents or chunks), in order.
+    Canonical docs get "source_urls" and "products" lists covering their duplicates.
+    Returns (kept, dropped_count).
+    """
+    kept = []
+    fingerprints = []
+    buckets = {}  # (band index, band value) -> indices into kept
+    dropped = 0
+
+    for doc in documents:
+        fingerprint = simhash(doc.page_content)
+        match = None
+        for band in _bands(fingerprint):
+            for candidate in buckets.get(band, ()):
+                if hamming(fingerprint, fingerprints[candidate]) <= threshold:
+                    match = candidate
+                    break
+            if match is not None:
+                break
+
+        if match is not None:
+            _merge_into(kept[match], doc)
+            dropped += 1
+            continue
+
+        meta = doc.metadata
+        meta["source_urls"] = list(meta.get("source_urls") or [meta.get("source")])
+        meta["products"] = list(meta.get("products") or ([meta["product"]] if meta.get("product") else []))
+        for band in _bands(fingerprint):
+            buckets.setdefault(band, []).append(len(kept))
+        kept.append(doc)
+        fingerprints.append(fingerprint)
+
+    return kept, dropped
@@ -0,0 +1,140 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict, deque
+
+# Load-aware degradation. When generation slots are backed up or first tokens are slow, /chat
+# steps down instead of making everyone wait for a full 256-token answer:
+#   normal     -> full retrieval + generation
+#   short      -> generation with max_new_tokens capped at SHORT_BUDGET
+#   extractive -> the best-matching span of the retrieved chunks, no LLM
+#   cache_only -> a cached answer when there is one, else extractive
+# Stepping down is immediate; stepping back up goes one mode at a time, each after load has
+# stayed below the lower thresholds for RECOVERY_SECONDS (hysteresis, so the mode doesn't flap).
+
+MODES = ("normal", "short", "extractive", "cache_only")
+
+DEGRADATION_ENABLED = os.getenv("DELORES_DEGRADATION", "1") == "1"
+SHORT_BUDGET = int(os.getenv("DELORES_SHORT_BUDGET", "64"))
+# Requests waiting for a generation slot at which each mode kicks in (short, extractive, cache_only)
+QUEUE_THRESHOLDS = tuple(int(v) for v in os.getenv("DELORES_DEGRADE_QUEUE", "2,6,12").split(","))
+# Recent median TTFT (ms) at which each mode kicks in
+TTFT_THRESHOLDS = tuple(float(v) for v in os.getenv("DELORES_DEGRADE_TTFT_MS", "3000,8000,15000").split(","))
+# Load must be below this fraction of a mode's threshold before stepping back up from it
+RECOVERY_RATIO = 0.5
+RECOVERY_SECONDS = float(os.getenv("DELORES_RECOVERY_SECONDS", "10"))
+TTFT_WINDOW_SECONDS = 60
+TTFT_WINDOW_SIZE = 50
+# Fewer recent samples than this don't count: one slow answer (or the last few before traffic
+# stopped) must not hold the server in a degraded mode where nothing new is generated
+TTFT_MIN_SAMPLES = int(os.getenv("DELORES_TTFT_MIN_SAMPLES", "5"))
+
+ANSWER_CACHE_SIZE = int(os.getenv("DELORES_ANSWER_CACHE_SIZE", "1000"))
+
+def _level(value, thresholds):
+    """Index into MODES reached by value (0 when below every threshold)."""
+    return sum(1 for threshold in thresholds if value >= threshold)
+
+class LoadPolicy:
+    """Picks the serving mode from the scheduler's queue depth and recent generation TTFTs."""
+
+    def __init__(self, queue_depth, queue_thresholds=QUEUE_THRESHOLDS, ttft_thresholds=TTFT_THRESHOLDS,
+                 recovery_seconds=RECOVERY_SECONDS, enabled=DEGRADATION_ENABLED, ttft_min_samples=TTFT_MIN_SAMPLES):
+        self.queue_depth = queue_depth  # callable -> requests currently waiting for a slot
+        self.queue_thresholds = queue_thresholds
+        self.ttft_thresholds = ttft_thresholds
+        self.recovery_seconds = recovery_seconds
+        self.enabled = enabled
+        self.ttft_min_samples = ttft_min_samples
+        self._ttfts = deque(maxlen=TTFT_WINDOW_SIZE)  # (monotonic time, ttft_ms)
+        self._level = 0
+        self._calm_since = None
+        self._changes = 0
+        self._lock = threading.Lock()
+
+    def record_ttft(self, ttft_ms):
+        """Called with the TTFT of every generated (not cached or extractive) answer."""
+        with self._lock:
+            self._ttfts.append((time.monotonic(), ttft_ms))
+
+    def _recent_ttft(self, now):
+        recent = sorted(ms for at, ms in self._ttfts if now - at <= TTFT_WINDOW_SECONDS)
+        if not recent or len(recent) < self.ttft_min_samples:
+            return 0.0
+        return recent[len(recent) // 2]
+
+    def _pressure(self, now, ratio=1.0):
+        queued = self.queue_depth()
+        ttft = self._recent_ttft(now)
+        return max(_level(queued, [t * ratio for t in self.queue_thresholds]),
+                   _level(ttft, [t * ratio for t in self.ttft_thresholds]))
+
+    def mode(self):
+        if not self.enabled:
+            return MODES[0]
+        now = time.monotonic()
+        with self._lock:
+            target = self._pressure(now)
+            if target > self._level:
+                self._level = target
+                self._calm_since = None
+                self._changes += 1
+            elif self._level and self._pressure(now, RECOVERY_RATIO) < self._level:
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif now - self._calm_since >= self.recovery_seconds:
+                    self._level -= 1
+                    self._calm_since = now if self._level else None
+                    self._changes += 1
+            else:
+                self._calm_since = None
+            return MODES[self._level]
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "mode": MODES[self._level],
+                "queue_depth": self.queue_depth(),
+                "recent_ttft_ms": self._recent_ttft(now),
+                "mode_changes": self._changes,
+            }
+
+def cache_key(query, language, product, index_version=None):
+    """Entries from before an index rebuild never match (see index_manifest.py)."""
+    return (re.sub(r"\s+", " ", query.strip().lower()), language, product, index_version)
+
+class AnswerCache:
+    """Thread-safe LRU of generated answers: key -> (response text, sources)."""
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, response, sources):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (response, sources)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,112 @@
+import sqlite3
+import hashlib
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Use absolute path relative to this file to avoid CWD confusion
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.db")
+
+# SQLite caps the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+def text_key(text: str) -> str:
+    """Hash of the whitespace-normalized chunk text."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Persistent chunk embedding store keyed by (model name, normalized text hash)."""
+
+    def __init__(self, db_path=CACHE_PATH):
+        self.db_path = db_path
+        self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT,
+                text_hash TEXT,
+                vector BLOB,
+                PRIMARY KEY (model, text_hash)
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def get_many(self, model: str, keys: list) -> dict:
+        """Returns {text_hash: vector} for the keys present in the cache."""
+        found = {}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        for i in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[i:i + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model] + batch
+            )
+            for key, blob in cursor.fetchall():
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        conn.close()
+        return found
+
+    def put_many(self, model: str, items: dict):
+        """Stores {text_hash: vector}."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+            [(model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+        )
+        conn.commit()
+        conn.close()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model so document embeddings are looked up in an EmbeddingCache first.
+    Only unseen chunks are sent to the model; queries always go straight through.
+    """
+
+    def __init__(self, embeddings, model_name, cache=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        keys = [text_key(t) for t in texts]
+        cached = self.cache.get_many(self.model_name, list(set(keys)))
+        # Distinct texts found in SQLite; repeats within this call are not hits across rebuilds
+        found = len(cached)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model_name, computed)
+            cached.update(computed)
+
+        self.misses += len(missing)
+        self.hits += found
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,269 @@
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add parent directory to path to allow importing backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from langchain_core.documents import Document
+from backend.rag import RAGPipeline
+
+EVAL_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = os.path.join(EVAL_DIR, "golden_dataset.json")
+BASELINE_PATH = os.path.join(EVAL_DIR, "retrieval_baseline.json")
+
+# Default grids: character-based recursive splitting, and structure-aware chunking (max tokens)
+DEFAULT_CHUNK_GRID = [(1000, 200), (800, 100), (500, 50)]
+DEFAULT_TOKEN_GRID = [128, 200, 256]
+DEFAULT_K_GRID = [1, 2, 5]
+
+def normalize_url(url):
+    return (url or "").rstrip("/").lower()
+
+def percentile(values, pct):
+    """Nearest-rank percentile, good enough for latency reporting."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[rank]
+
+def rank_of_expected(docs, expected_url):
+    """1-based rank of the first retrieved chunk coming from expected_url (None if missed)."""
+    target = normalize_url(expected_url)
+    for i, d in enumerate(docs):
+        # Deduplicated chunks list every URL they were published at
+        urls = d.metadata.get("source_urls") or [d.metadata.get("source")]
+        if target in (normalize_url(u) for u in urls):
+            return i + 1
+    return None
+
+def score_queries(rag, dataset, k):
+    """Runs retrieve() for every example and computes recall@k, MRR, nDCG and latency."""
+    hits, rr, ndcg, latencies = 0, 0.0, 0.0, []
+
+    # Warm up so the first query doesn't pay for lazy initialisation
+    rag.retrieve(dataset[0]["query"], k=k)
+
+    for example in dataset:
+        start = time.perf_counter()
+        docs = rag.retrieve(example["query"], k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        rank = rank_of_expected(docs, example.get("expected_source_url"))
+        if rank:
+            hits += 1
+            rr += 1.0 / rank
+            # Single relevant URL per query, so the ideal DCG is 1.0
+            ndcg += 1.0 / math.log2(rank + 1)
+
+    n = len(dataset)
+    return {
+        "recall": hits / n,
+        "mrr": rr / n,
+        "ndcg": ndcg / n,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        },
+    }
+
+def measure_search_path(search, vectors):
+    """Per-query latency (ms) and mean bytes allocated per query for one search implementation."""
+    latencies = []
+    for vector in vectors:
+        start = time.perf_counter()
+        search(vector)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    # Allocations are measured in a separate pass: tracemalloc itself slows everything down
+    tracemalloc.start()
+    allocated = 0
+    for vector in vectors:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        search(vector)
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "alloc_bytes": allocated / len(vectors)}
+
+def compare_search_paths(rag, dataset, k):
+    """
+    Search-only cost (query embeddings precomputed) of LangChain's similarity_search_by_vector
+    vs the raw index + chunk table path used by retrieve(), plus the batched path per query.
+    """
+    vectors = rag._embed_queries([e["query"] for e in dataset])
+    langchain = measure_search_path(lambda v: rag.vector_store.similarity_search_by_vector(v.tolist(), k=k), vectors)
+    lean = measure_search_path(lambda v: rag.chunk_table[rag.search_vectors(v[None, :], k)[1][0]], vectors)
+
+    start = time.perf_counter()
+    rag.search_vectors(vectors, k)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(vectors)
+    return {"langchain": langchain, "lean": lean, "batch_per_query_ms": batch_ms}
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+def load_documents(rag, documents_path=None):
+    """
+    Source documents for re-chunking.
+    Either a JSON list of {"title", "content", "url"} records (what scraper.build_article returns),
+    or, as an approximation, the chunks of the current index regrouped per source URL.
+    """
+    if documents_path:
+        with open(documents_path, "r") as f:
+            records = json.load(f)
+        return [Document(page_content=r["content"], metadata={"source": r["url"], "title": r["title"], "product": "Irembo"})
+                for r in records]
+
+    rag.load_vector_store()
+    if not rag.vector_store:
+        return []
+
+    grouped = {}
+    for doc_id in rag.vector_store.index_to_docstore_id.values():
+        doc = rag.vector_store.docstore.search(doc_id)
+        source = doc.metadata.get("source", "#")
+        if source not in grouped:
+            grouped[source] = Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+        else:
+            grouped[source].page_content += "\n" + doc.page_content
+    return list(grouped.values())
+
+def run_benchmark(chunk_grid, k_grid, documents_path=None, token_grid=()):
+    with open(DATASET_PATH, "r") as f:
+        dataset = json.load(f)
+
+    rag = RAGPipeline()
+    documents = load_documents(rag, documents_path)
+    if not documents:
+        print("❌ Error: No documents available (no faiss_index and no --documents file).")
+        return None
+
+    print(f"📊 Benchmarking retrieval on {len(dataset)} queries over {len(documents)} documents...\n")
+    runs = []
+
+    configs = [("recursive", {"chunk_size": cs, "chunk_overlap": ov}, f"cs{cs}_ov{ov}") for cs, ov in chunk_grid]
+    configs += [("structure", {"max_tokens": t}, f"struct_t{t}") for t in token_grid]
+
+    for strategy, params, name in configs:
+        print(f"🔹 {strategy} {params}")
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            # Uncached: index_build_s measures real embedding time, and grid-only chunks stay out of embedding_cache.db
+            rag.initialize_vector_store(documents, index_path=None, strategy=strategy, use_cache=False, **params)
+            build_s = time.perf_counter() - start
+            rag.vector_store.save_local(tmp)
+            size_bytes = directory_size(tmp)
+
+        run = dict(params, **{
+            "name": name,
+            "strategy": strategy,
+            "num_chunks": rag.vector_store.index.ntotal,
+            "chunks_per_document": rag.vector_store.index.ntotal / len(documents),
+            "index_build_s": build_s,
+            "index_size_bytes": size_bytes,
+            "k": {},
+        })
+        for k in k_grid:
+            scores = score_queries(rag, dataset, k)
+            scores["search_paths"] = compare_search_paths(rag, dataset, k)
+            run["k"][str(k)] = scores
+            print(f"   k={k}: recall={scores['recall']:.3f} mrr={scores['mrr']:.3f} "
+                  f"ndcg={scores['ndcg']:.3f} p95={scores['latency_ms']['p95']:.2f}ms")
+            paths = scores["search_paths"]
+            print(f"         search p50 langchain={paths['langchain']['p50'] * 1000:.0f}us "
+                  f"lean={paths['lean']['p50'] * 1000:.0f}us batched={paths['batch_per_query_ms'] * 1000:.0f}us/query | "
+                  f"alloc/query langchain={paths['langchain']['alloc_bytes']:.0f}B lean={paths['lean']['alloc_bytes']:.0f}B")
+        print(f"   build={build_s:.2f}s size={size_bytes / 1024:.1f}KB chunks={run['num_chunks']} "
+              f"({run['chunks_per_document']:.1f}/doc)")
+        print("-" * 30)
+        runs.append(run)
+
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "num_queries": len(dataset), "runs": runs}
+
+def compare_to_baseline(results, baseline, max_recall_drop, max_latency_increase):
+    """Returns a list of human-readable regressions (empty when everything is within thresholds)."""
+    regressions = []
+    baseline_runs = {r["name"]: r for r in baseline.get("runs", [])}
+
+    for run in results["runs"]:
+        base = baseline_runs.get(run["name"])
+        if not base:
+            continue
+        for k, scores in run["k"].items():
+            base_scores = base["k"].get(k)
+            if not base_scores:
+                continue
+            if base_scores["recall"] - scores["recall"] > max_recall_drop:
+                regressions.append(f"{run['name']} k={k}: recall {base_scores['recall']:.3f} -> {scores['recall']:.3f}")
+            base_p95 = base_scores["latency_ms"]["p95"]
+            p95 = scores["latency_ms"]["p95"]
+            if base_p95 > 0 and (p95 - base_p95) / base_p95 > max_latency_increase:
+                regressions.append(f"{run['name']} k={k}: p95 latency {base_p95:.2f}ms -> {p95:.2f}ms")
+    return regressions
+
+def parse_grid(values):
+    grid = []
+    for value in values:
+        size, overlap = value.split(":")
+        grid.append((int(size), int(overlap)))
+    return grid
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval-only benchmark (no LLM).")
+    parser.add_argument("--chunks", nargs="+", help="chunk_size:overlap pairs, e.g. 1000:200 500:50")
+    parser.add_argument("--max-tokens", nargs="+", type=int, help="Structure-aware chunk sizes in embedding tokens, e.g. 128 200")
+    parser.add_argument("--strategies", nargs="+", choices=["recursive", "structure"], default=["recursive", "structure"])
+    parser.add_argument("--k", nargs="+", type=int, default=DEFAULT_K_GRID)
+    parser.add_argument("--documents", help="JSON list of {title, content, url} to chunk (defaults to the current index)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results")
+    parser.add_argument("--output", help="Also write the results JSON here")
+    parser.add_argument("--max-recall-drop", type=float, default=0.02)
+    parser.add_argument("--max-latency-increase", type=float, default=0.25, help="Relative p95 increase allowed")
+    args = parser.parse_args()
+
+    chunk_grid = parse_grid(args.chunks) if args.chunks else DEFAULT_CHUNK_GRID
+    token_grid = args.max_tokens or DEFAULT_TOKEN_GRID
+    results = run_benchmark(
+        chunk_grid if "recursive" in args.strategies else [],
+        args.k,
+        args.documents,
+        token_grid if "structure" in args.strategies else []
+    )
+    if results is None:
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nℹ️ No baseline at {args.baseline}. Run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.max_recall_drop, args.max_latency_increase)
+    if regressions:
+        print("\n❌ Regressions vs baseline:")
+        for r in regressions:
+            print(f"   {r}")
+        sys.exit(1)
+    print("\n✅ No regressions vs baseline.")
+
+if __name__ == "__main__":
+    main()
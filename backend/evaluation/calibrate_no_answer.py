@@ -0,0 +1,121 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+# Add parent directory to path to allow importing backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.rag import RAGPipeline
+from backend.metrics import MetricsManager
+from backend.no_answer import CALIBRATION_PATH
+
+EVAL_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = os.path.join(EVAL_DIR, "golden_dataset.json")
+
+# Questions the assistant must not try to answer. Golden examples can add more with "answerable": false.
+OFF_TOPIC_QUERIES = [
+    "What's the weather like in Kigali tomorrow?",
+    "Write me a poem about the ocean",
+    "Who won the football match yesterday?",
+    "How do I bake banana bread?",
+    "Recommend a good laptop for gaming",
+    "Quel temps fait-il à Paris ?",
+    "Explain quantum computing in simple terms",
+]
+
+# Feedback is 1-5: 4+ means the answer helped, 2 or less means it did not
+POSITIVE_FEEDBACK = 4
+NEGATIVE_FEEDBACK = 2
+
+def golden_samples(rag, dataset, k):
+    """
+    (top_score, answerable) per golden query. A query counts as answerable when its expected
+    source is retrieved; misses are left out since the threshold can't fix them.
+    """
+    samples = []
+    for example in dataset:
+        hits = rag.retrieve_with_scores(example["query"], k=k)
+        if not hits:
+            continue
+        top_score = hits[0][1]
+        if example.get("answerable") is False:
+            samples.append((top_score, False))
+            continue
+        expected = (example.get("expected_source_url") or "").rstrip("/").lower()
+        urls = [u.rstrip("/").lower() for doc, _ in hits for u in doc.metadata.get("source_urls") or [doc.metadata.get("source", "")]]
+        if expected in urls:
+            samples.append((top_score, True))
+    for query in OFF_TOPIC_QUERIES:
+        hits = rag.retrieve_with_scores(query, k=k)
+        if hits:
+            samples.append((hits[0][1], False))
+    return samples
+
+def feedback_samples(metrics):
+    """(top_score, helpful) from rated chat_logs rows; neutral ratings are ignored."""
+    samples = []
+    for top_score, feedback in metrics.scored_feedback():
+        if feedback >= POSITIVE_FEEDBACK:
+            samples.append((top_score, True))
+        elif feedback <= NEGATIVE_FEEDBACK:
+            samples.append((top_score, False))
+    return samples
+
+def pick_threshold(samples, target_recall):
+    """Highest threshold that still lets target_recall of the answerable queries through."""
+    positives = sorted(score for score, answerable in samples if answerable)
+    negatives = [score for score, answerable in samples if not answerable]
+    if not positives:
+        return None, {}
+    threshold = positives[int(math.floor((1.0 - target_recall) * len(positives)))]
+    kept = sum(1 for s in positives if s >= threshold) / len(positives)
+    rejected = sum(1 for s in negatives if s < threshold) / len(negatives) if negatives else None
+    return threshold, {"answerable_kept": kept, "unanswerable_rejected": rejected,
+                       "positives": len(positives), "negatives": len(negatives)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the no-answer threshold on retrieval scores.")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="Share of answerable queries that must still reach the LLM")
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--no-feedback", action="store_true", help="Only use the golden set and the off-topic queries")
+    parser.add_argument("--output", default=CALIBRATION_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="Print the threshold without saving it")
+    args = parser.parse_args()
+
+    with open(DATASET_PATH, "r") as f:
+        dataset = json.load(f)
+
+    rag = RAGPipeline()
+    rag.load_vector_store()
+    if not rag.vector_store:
+        print("❌ Error: No faiss_index to calibrate against.")
+        sys.exit(1)
+
+    samples = golden_samples(rag, dataset, args.k)
+    print(f"📊 Golden set + off-topic: {len(samples)} scored queries")
+    if not args.no_feedback:
+        rated = feedback_samples(MetricsManager())
+        print(f"📊 Rated chat logs: {len(rated)} interactions")
+        samples += rated
+
+    threshold, report = pick_threshold(samples, args.target_recall)
+    if threshold is None:
+        print("❌ No answerable samples; cannot calibrate.")
+        sys.exit(1)
+
+    rejected = report["unanswerable_rejected"]
+    print(f"\n🎯 Threshold {threshold:.4f} keeps {report['answerable_kept']:.0%} of {report['positives']} answerable queries"
+          + (f" and rejects {rejected:.0%} of {report['negatives']} unanswerable ones" if rejected is not None else ""))
+
+    if args.dry_run:
+        return
+    with open(args.output, "w") as f:
+        json.dump(dict(report, threshold=threshold, target_recall=args.target_recall,
+                       created=time.strftime("%Y-%m-%dT%H:%M:%S")), f, indent=2)
+    print(f"💾 Saved to {args.output} (DELORES_NO_ANSWER_THRESHOLD still overrides it)")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
+import argparse
 import json
 import os
 import sys
+import time
 import collections
 
 # Add parent directory to path to allow importing backend modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from backend.rag import RAGPipeline
+from backend.rag import RAGPipeline, ANSWER_MODES
 
 def normalize_text(text):
     """Lower text and remove punctuation, articles and extra whitespace."""
@@ -42,7 +44,7 @@ def f1_score(prediction, ground_truth):
     f1 = (2 * precision * recall) / (precision + recall)
     return f1
 
-def evaluate_metrics():
+def evaluate_metrics(answer_modes=("generative",)):
     dataset_path = os.path.join(os.path.dirname(__file__), "golden_dataset.json")
     if not os.path.exists(dataset_path):
         print(f"❌ Error: Dataset not found at {dataset_path}")
@@ -55,44 +57,65 @@ def evaluate_metrics():
     rag = RAGPipeline()
     rag.load_vector_store()
 
-    print(f"\n📊 Starting Evaluation on {len(dataset)} examples...\n")
-    
-    total_f1 = 0
-    total_source_match = 0
-    
-    for i, example in enumerate(dataset):
-        query = example["query"]
-        ground_truth = example["ground_truth"]
-        expected_url = example.get("expected_source_url")
-        
-        print(f"🔹 Test {i+1}: {query}")
-        
-        # Run Inference
-        result = rag.answer_query(query)
-        prediction = result["response"]
-        sources = result["sources"]
+    results = {}
+    for answer_mode in answer_modes:
+        print(f"\n📊 Starting {answer_mode} Evaluation on {len(dataset)} examples...\n")
         
-        # Calculate F1
-        score = f1_score(prediction, ground_truth)
-        total_f1 += score
+        total_f1 = 0
+        total_source_match = 0
+        latencies = []
         
-        # Check Source
-        retrieved_urls = [s["url"] for s in sources]
-        source_hit = expected_url in retrieved_urls if expected_url else False
-        if source_hit:
-            total_source_match += 1
+        for i, example in enumerate(dataset):
+            query = example["query"]
+            ground_truth = example["ground_truth"]
+            expected_url = example.get("expected_source_url")
+            
+            print(f"🔹 Test {i+1}: {query}")
+            
+            # Run Inference
+            start = time.perf_counter()
+            result = rag.answer_query(query, answer_mode=answer_mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+            prediction = result["response"]
+            sources = result["sources"]
+            
+            # Calculate F1
+            score = f1_score(prediction, ground_truth)
+            total_f1 += score
             
-        print(f"   Prediction: {prediction[:100]}...")
-        print(f"   F1 Score: {score:.4f}")
-        print(f"   Source Match: {'✅' if source_hit else '❌'}")
-        print("-" * 30)
+            # Check Source
+            retrieved_urls = [u for s in sources for u in s.get("source_urls", [s["url"]])]
+            source_hit = expected_url in retrieved_urls if expected_url else False
+            if source_hit:
+                total_source_match += 1
+                
+            print(f"   Prediction: {prediction[:100]}...")
+            print(f"   F1 Score: {score:.4f}")
+            print(f"   Source Match: {'✅' if source_hit else '❌'}")
+            print(f"   Latency: {latencies[-1]:.0f} ms")
+            print("-" * 30)
 
-    avg_f1 = total_f1 / len(dataset)
-    avg_source_acc = (total_source_match / len(dataset)) * 100
+        latencies.sort()
+        results[answer_mode] = {
+            "f1": total_f1 / len(dataset),
+            "source_accuracy": (total_source_match / len(dataset)) * 100,
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        }
     
     print("\n📈 Final Results:")
-    print(f"   Average F1 Score: {avg_f1:.4f}")
-    print(f"   Retrieval Accuracy: {avg_source_acc:.2f}%")
+    for answer_mode, r in results.items():
+        print(f"   {answer_mode:<11} F1 {r['f1']:.4f} | Retrieval Accuracy {r['source_accuracy']:.2f}% | "
+              f"latency p50 {r['p50_ms']:.0f} ms, p95 {r['p95_ms']:.0f} ms")
+    return results
 
 if __name__ == "__main__":
-    evaluate_metrics()
+    parser = argparse.ArgumentParser(description="F1, source accuracy and latency on the golden dataset.")
+    parser.add_argument("--modes", default="generative",
+                        help=f"Comma-separated answer modes to compare ({', '.join(ANSWER_MODES)})")
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in ANSWER_MODES]
+    if unknown:
+        parser.error(f"unknown answer modes: {unknown}")
+    evaluate_metrics(modes)
@@ -0,0 +1,172 @@
+import logging
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+
+# Pure HTML -> article extraction. Kept free of model imports so it can run in
+# worker processes (ProcessPoolExecutor) without loading TinyLlama/BLIP there.
+
+logger = logging.getLogger(__name__)
+
+# Prefer the C-based lxml parser when installed; html.parser is the pure-Python fallback
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# Freshdesk article body selectors, in priority order: (name, attribute, value)
+BODY_SELECTORS = [
+    # Freshdesk common selectors
+    ("class=article-body", "class", "article-body"),
+    ("class=fr-view", "class", "fr-view"),  # Froala editor
+    ("class=article-content", "class", "article-content"),
+    ("class=solution-article-content", "class", "solution-article-content"),
+    ("id=article-content", "id", "article-content"),
+    ("id=article-body", "id", "article-body"),
+    ("itemprop=articleBody", "itemprop", "articleBody"),
+
+    # Generic content selectors
+    ("class=description-text", "class", "description-text"),
+    ("class=g-content", "class", "g-content"),
+    ("class=fw-article-content", "class", "fw-article-content"),
+    ("class=content-body", "class", "content-body"),
+]
+
+SKIP_CLASSES = ['nav', 'menu', 'footer', 'header', 'sidebar']
+JUNK_TAGS = ["script", "style", "form", "button", "nav", "header", "footer"]
+
+def parse_html(html):
+    return BeautifulSoup(html, PARSER)
+
+def _matches(element, attribute, value):
+    if attribute == "class":
+        return value in (element.get("class") or [])
+    return element.get(attribute) == value
+
+def find_body_by_selectors(soup):
+    """
+    Single pass over <div>/<section> elements recording the first match of every selector,
+    then picks the highest-priority one with text (a <div> match wins over a <section>).
+    Returns (element, selector_name) or (None, None).
+    """
+    first_div = {}
+    first_section = {}
+    for element in soup.find_all(["div", "section"]):
+        seen = first_div if element.name == "div" else first_section
+        for i, (_, attribute, value) in enumerate(BODY_SELECTORS):
+            if i not in seen and _matches(element, attribute, value):
+                seen[i] = element
+
+    for i, (name, _, _) in enumerate(BODY_SELECTORS):
+        candidate = first_div.get(i) or first_section.get(i)
+        if candidate is not None and candidate.get_text(strip=True):
+            return candidate, name
+    return None, None
+
+def find_largest_text_div(soup, min_length=100):
+    """
+    Fallback: the classed <div> with the most text that isn't navigation/footer chrome.
+    Text lengths are accumulated bottom-up in one pass over the text nodes, instead of
+    calling get_text() on every (nested) div, which is quadratic on large pages.
+    """
+    lengths = {}
+    for string in soup.find_all(string=True):
+        if string.parent is not None and string.parent.name in ("script", "style"):
+            continue
+        size = len(string.strip())
+        if not size:
+            continue
+        for parent in string.parents:
+            if parent.name == "div" and parent.get("class"):
+                lengths[id(parent)] = lengths.get(id(parent), 0) + size
+
+    best_div, max_text_length = None, 0
+    for div in soup.find_all('div', class_=True):
+        size = lengths.get(id(div), 0)
+        if size > max_text_length and size > min_length:
+            classes = ' '.join(div.get('class', []))
+            if not any(skip in classes.lower() for skip in SKIP_CLASSES):
+                max_text_length = size
+                best_div = div
+    return best_div, max_text_length
+
+def mark_structure(body):
+    """
+    Keeps the structure that get_text() would flatten, for the chunker (see chunking.py):
+    headings become "# ..." to "#### ..." lines and ordered-list items get their step number.
+    """
+    for heading in body.find_all(["h1", "h2", "h3", "h4"]):
+        text = heading.get_text(" ", strip=True)
+        if text:
+            heading.string = f"{'#' * int(heading.name[1])} {text}"
+    for ordered_list in body.find_all("ol"):
+        for number, item in enumerate(ordered_list.find_all("li", recursive=False), start=1):
+            first = next((s for s in item.find_all(string=True) if s.strip()), None)
+            if first is not None:
+                first.replace_with(f"{number}. {first.strip()}")
+
+def extract_article(html, url):
+    """
+    Extracts title, cleaned body text and absolute image URLs from an article page.
+    Returns a dict (including the winning "selector" strategy) or None when no body is found.
+    """
+    try:
+        soup = parse_html(html)
+
+        # Extract Title
+        title = "No Title"
+        title_elem = soup.find('h1') or soup.find('h2', class_='article-title')
+        if title_elem:
+            title = title_elem.get_text(strip=True)
+
+        # Strategy 1: Freshdesk-specific selectors (one pass)
+        body, selector = find_body_by_selectors(soup)
+
+        # Strategy 2 & 3: <article>, then <main>
+        for tag in ("article", "main"):
+            if body is None:
+                candidate = soup.find(tag)
+                if candidate and candidate.get_text(strip=True):
+                    body, selector = candidate, f"<{tag}>"
+
+        # Strategy 4: the classed div with the most text
+        if body is None:
+            logger.warning(f"      ⚠️ No content body found with standard selectors for {url}")
+            best_div, text_length = find_largest_text_div(soup)
+            if best_div is not None:
+                body, selector = best_div, "largest-div"
+                classes = ' '.join(best_div.get('class', []))
+                logger.info(f"      ✅ Found best content div with classes: {classes} ({text_length} chars)")
+            else:
+                sample_classes = [' '.join(d.get('class', [])) for d in soup.find_all('div', class_=True, limit=10)]
+                logger.warning(f"      ⚠️ Sample div classes found: {sample_classes}")
+                return None
+
+        # Collect images BEFORE stripping tags
+        image_urls = []
+        for img in body.find_all('img'):
+            src = img.get('src')
+            if src:
+                full_img_url = urljoin(url, src)
+                if full_img_url not in image_urls:
+                    image_urls.append(full_img_url)
+
+        # Clean up junk
+        for s in body(JUNK_TAGS):
+            s.decompose()
+        mark_structure(body)
+
+        # Extract text and clean up excessive whitespace
+        text = body.get_text(separator="\n", strip=True)
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+
+        return {
+            "title": title,
+            "text": '\n'.join(lines),
+            "url": url,
+            "image_urls": image_urls,
+            "selector": selector,
+        }
+    except Exception as e:
+        logger.error(f"      ❌ Error parsing {url}: {e}")
+    return None
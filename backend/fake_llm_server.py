@@ -0,0 +1,83 @@
+import json
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal OpenAI-compatible /v1/chat/completions server for exercising the "openai" generation backend
+# without a model. It answers with a fixed sentence (or echoes the question), streamed word by word.
+#   python backend/fake_llm_server.py --port 8080 --token-delay 0.02
+#   DELORES_GENERATION_BACKEND=openai DELORES_LLM_URL=http://127.0.0.1:8080/v1 uvicorn backend.server:app
+
+REPLY = "You can apply on irembo.gov.rw by choosing the service, filling in the form and paying the fee."
+
+class FakeCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so the client's connection pool is exercised
+    token_delay = 0.0
+    echo = False
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = request["messages"][-1]["content"]
+        text = prompt.rsplit("Question:", 1)[-1].split("Answer:")[0].strip() if self.echo else REPLY
+        words = text.split(" ")[:request.get("max_tokens", 256)]
+
+        if not request.get("stream"):
+            time.sleep(self.token_delay * len(words))
+            self._send_json(200, {
+                "object": "chat.completion",
+                "model": request.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": {"completion_tokens": len(words)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, word in enumerate(words):
+                time.sleep(self.token_delay)
+                delta = {"content": word if i == 0 else " " + word}
+                self._send_chunk({"choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            self._send_chunk({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled: a real server would stop decoding here
+            print("✋ Client disconnected mid-stream")
+
+    def _send_chunk(self, body):
+        self._write_chunk(f"data: {json.dumps(body)}\n\n".encode())
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible completion server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per streamed word")
+    parser.add_argument("--echo", action="store_true", help="Answer with the question instead of the fixed reply")
+    args = parser.parse_args()
+
+    FakeCompletionsHandler.token_delay = args.token_delay
+    FakeCompletionsHandler.echo = args.echo
+    server = ThreadingHTTPServer((args.host, args.port), FakeCompletionsHandler)
+    print(f"🤖 Fake LLM server on http://{args.host}:{args.port}/v1/chat/completions")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
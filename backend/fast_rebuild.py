@@ -5,14 +5,15 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.scraper import scrape_portal
+from backend.corpus import CorpusStore
 from backend.rag import RAGPipeline
 
 def fast_rebuild():
     print("🚀 Starting FAST Knowledge Base Rebuild (Limit 15, No Images)...")
     
-    # 1. Scrape with limits
+    # 1. Scrape with limits (raw pages are kept in backend/corpus for offline replay)
     # We scrape 15 docs. Since homepage is added to list, it should be included.
-    docs = scrape_portal(limit=15, skip_images=True)
+    docs = scrape_portal(limit=15, skip_images=True, corpus=CorpusStore())
     
     # 2. Ingest
     if docs:
@@ -0,0 +1,150 @@
+import os
+import json
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Where answers are generated:
+#   "local"  -> TinyLlama through local_models (in-process, or the model host with DELORES_MODEL_HOST)
+#   "openai" -> an OpenAI-compatible server (llama.cpp server, vLLM, ...) at DELORES_LLM_URL
+GENERATION_BACKEND = os.getenv("DELORES_GENERATION_BACKEND", "local")
+LLM_URL = os.getenv("DELORES_LLM_URL", "http://127.0.0.1:8080/v1")
+LLM_MODEL = os.getenv("DELORES_LLM_MODEL", "TinyLlama-1.1B-Chat-v1.0")
+LLM_API_KEY = os.getenv("DELORES_LLM_API_KEY", "")
+LLM_CONNECT_TIMEOUT = float(os.getenv("DELORES_LLM_CONNECT_TIMEOUT", "2"))
+# Per read: for streams this bounds the gap between two chunks, not the whole answer
+LLM_READ_TIMEOUT = float(os.getenv("DELORES_LLM_READ_TIMEOUT", "60"))
+LLM_POOL_SIZE = int(os.getenv("DELORES_LLM_POOL_SIZE", "16"))
+
+class GenerationBackend(ABC):
+    """What RAGPipeline needs from a text generator. Prompts are plain text (see RAGPipeline.build_prompt)."""
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self, prompt, max_new_tokens=None, stop_sequences=None):
+        pass
+
+    @abstractmethod
+    def generate_stream(self, prompt, assist=None, max_new_tokens=None, stop_sequences=None, cancel_event=None):
+        """Yields text pieces; stops early once cancel_event is set."""
+
+    def generate_batch(self, prompts, max_new_tokens=None, stop_sequences=None, batch_size=4):
+        return [self.generate(p, max_new_tokens=max_new_tokens, stop_sequences=stop_sequences) for p in prompts]
+
+class LocalGenerationBackend(GenerationBackend):
+    """In-process transformers generation (or the shared model host), via local_models."""
+
+    name = "local"
+
+    def __init__(self, models=None):
+        if models is None:
+            from .local_model import local_models as models
+        self.models = models
+
+    def generate(self, prompt, max_new_tokens=None, stop_sequences=None):
+        return self.models.generate_response(prompt, max_new_tokens=max_new_tokens, stop_sequences=stop_sequences)
+
+    def generate_stream(self, prompt, assist=None, max_new_tokens=None, stop_sequences=None, cancel_event=None):
+        return self.models.generate_response_stream(
+            prompt, assist=assist, max_new_tokens=max_new_tokens,
+            stop_sequences=stop_sequences, cancel_event=cancel_event
+        )
+
+    def generate_batch(self, prompts, max_new_tokens=None, stop_sequences=None, batch_size=4):
+        return self.models.generate_batch(prompts, max_new_tokens=max_new_tokens, stop_sequences=stop_sequences, batch_size=batch_size)
+
+class OpenAICompatibleBackend(GenerationBackend):
+    """
+    Chat-completions client for a locally hosted OpenAI-compatible server.
+    One pooled requests.Session (keep-alive) is shared by all threads. Connection errors
+    are retried, but a request that reached the server is never retried. Streams use SSE,
+    and closing the response tells the server to stop decoding.
+    "assist" is ignored: speculative decoding is configured on the server.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url=LLM_URL, model=LLM_MODEL, api_key=LLM_API_KEY,
+                 connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT, pool_size=LLM_POOL_SIZE):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.1)
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _payload(self, prompt, max_new_tokens, stop_sequences, stream):
+        if not max_new_tokens:
+            # Only when needed: importing local_model pulls in torch and the local models
+            from .local_model import DEFAULT_MAX_NEW_TOKENS as max_new_tokens
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_new_tokens,
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "stream": stream,
+        }
+        if stop_sequences:
+            payload["stop"] = list(stop_sequences)
+        return payload
+
+    def generate(self, prompt, max_new_tokens=None, stop_sequences=None):
+        response = self.session.post(self.url, json=self._payload(prompt, max_new_tokens, stop_sequences, False), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    def generate_stream(self, prompt, assist=None, max_new_tokens=None, stop_sequences=None, cancel_event=None):
+        response = self.session.post(
+            self.url, json=self._payload(prompt, max_new_tokens, stop_sequences, True),
+            timeout=self.timeout, stream=True
+        )
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choice = json.loads(data)["choices"][0]
+                text = choice.get("delta", {}).get("content")
+                if text:
+                    yield text
+                if choice.get("finish_reason"):
+                    break
+        finally:
+            # Dropping the connection mid-stream aborts generation on llama.cpp/vLLM servers
+            response.close()
+            if cancel_event is not None:
+                cancel_event.set()
+
+    def generate_batch(self, prompts, max_new_tokens=None, stop_sequences=None, batch_size=4):
+        # Concurrent requests: the server batches them itself (continuous batching)
+        with ThreadPoolExecutor(max_workers=min(batch_size, self.pool_size)) as pool:
+            return list(pool.map(lambda p: self.generate(p, max_new_tokens, stop_sequences), prompts))
+
+def get_generation_backend(name=GENERATION_BACKEND):
+    if name == "openai":
+        logger.info(f"🔌 Generation backend: OpenAI-compatible server at {LLM_URL} ({LLM_MODEL})")
+        return OpenAICompatibleBackend()
+    if name == "local":
+        return LocalGenerationBackend()
+    raise ValueError(f"Unknown generation backend: {name}")
@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import hashlib
+
+# faiss_index/manifest.json: what an index was built from and with. Written by
+# initialize_vector_store next to index.faiss/index.pkl and checked before load_vector_store
+# unpickles anything. index_version is derived from the inputs (embedding model, chunking config,
+# corpus), so answer caches keyed on it are invalidated exactly when a rebuild changes the index.
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = 1
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+class IndexManifestError(ValueError):
+    pass
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def corpus_hash(documents):
+    """Order-independent hash of the ingested documents (source + content)."""
+    digest = hashlib.sha256()
+    for entry in sorted(f"{d.metadata.get('source', '')}\0{hashlib.sha256(d.page_content.encode()).hexdigest()}"
+                        for d in documents):
+        digest.update(entry.encode())
+    return digest.hexdigest()
+
+def index_version(embedding_model, chunk_config, corpus):
+    payload = json.dumps([embedding_model, chunk_config, corpus], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+def build_manifest(embedding_model, dimension, chunk_config, documents, chunk_count):
+    corpus = corpus_hash(documents)
+    return {
+        "format": MANIFEST_FORMAT,
+        "index_version": index_version(embedding_model, chunk_config, corpus),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "embedding": {"model": embedding_model, "dimension": dimension},
+        "chunking": chunk_config,
+        "corpus_hash": corpus,
+        "doc_count": len(documents),
+        "chunk_count": chunk_count,
+    }
+
+def write_manifest(index_path, manifest):
+    """Adds checksums of the saved index files and writes manifest.json."""
+    manifest = dict(manifest, checksums={name: file_sha256(os.path.join(index_path, name)) for name in INDEX_FILES})
+    with open(os.path.join(index_path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def read_manifest(index_path):
+    path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def verify_files(index_path, manifest):
+    """Checksums of index.faiss/index.pkl against the manifest; run before unpickling."""
+    for name, expected in manifest.get("checksums", {}).items():
+        path = os.path.join(index_path, name)
+        if not os.path.exists(path):
+            raise IndexManifestError(f"{path} is listed in {MANIFEST_FILE} but missing")
+        if file_sha256(path) != expected:
+            raise IndexManifestError(f"{path} does not match its {MANIFEST_FILE} checksum (modified or partially written)")
+
+def verify_compatible(manifest, embedding_model, index_dimension):
+    """The loaded index must have been built with the serving embedding model."""
+    built_with = manifest["embedding"]
+    if built_with["model"] != embedding_model:
+        raise IndexManifestError(f"Index was built with {built_with['model']} but the server embeds with {embedding_model}; rebuild the index")
+    if built_with["dimension"] != index_dimension:
+        raise IndexManifestError(f"Index dimension {index_dimension} does not match the manifest ({built_with['dimension']})")
+
+def legacy_version(index_path):
+    """Version for indexes saved before manifests existed: a hash of the index file itself."""
+    return "legacy-" + file_sha256(os.path.join(index_path, INDEX_FILES[0]))[:12]
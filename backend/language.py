@@ -0,0 +1,27 @@
+import re
+
+# Lightweight stopword-based language identification for the three portal languages.
+# Good enough to route FreshDesk articles and queries without an extra model dependency.
+SUPPORTED_LANGUAGES = ("en", "fr", "rw")
+DEFAULT_LANGUAGE = "en"
+
+STOPWORDS = {
+    "en": {"the", "and", "to", "of", "is", "you", "your", "for", "in", "on", "with", "how", "what",
+           "can", "this", "are", "be", "will", "please", "if", "or", "an", "my", "do", "from"},
+    "fr": {"le", "la", "les", "des", "et", "de", "du", "pour", "vous", "votre", "est", "une", "un",
+           "sur", "avec", "comment", "dans", "qui", "que", "pas", "au", "aux", "ce", "cette", "par"},
+    "rw": {"ni", "na", "mu", "ku", "kwa", "kandi", "cyangwa", "ngo", "iyo", "kugira", "uko", "ubwo",
+           "niba", "ari", "kuri", "uburyo", "serivisi", "gusaba", "kwishyura", "icyemezo", "nigute",
+           "ese", "mwiriwe", "muraho", "ryari", "angahe", "cyane", "bwa", "rya", "cya"},
+}
+
+WORD_PATTERN = re.compile(r"[a-zàâçéèêëîïôûùüÿœ]+", re.IGNORECASE)
+
+def detect_language(text, default=DEFAULT_LANGUAGE, max_chars=2000):
+    """Returns "en", "fr" or "rw" depending on which stopword list the text hits most."""
+    words = WORD_PATTERN.findall(text[:max_chars].lower())
+    if not words:
+        return default
+    scores = {lang: sum(1 for w in words if w in stopwords) for lang, stopwords in STOPWORDS.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else default
@@ -1,13 +1,74 @@
+from .snapshot import model_path, MODEL_IDS  # first: sets the HF offline flags when serving from a snapshot
 import torch
 from PIL import Image
 from transformers import BlipProcessor, BlipForConditionalGeneration
 from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
+from transformers import StoppingCriteria, StoppingCriteriaList
 from sentence_transformers import SentenceTransformer
 import logging
-from threading import Thread
+import os
+from threading import Thread, Event
+from .generation import GENERATION_BACKEND
+from .resources import configure_resources
+from . import profiling
 
 logger = logging.getLogger(__name__)
 
+# Assisted generation ("speculative decoding"): a cheap proposer drafts several tokens
+# and TinyLlama verifies them in a single forward pass.
+#   "prompt_lookup" -> n-gram lookup in the prompt (answers often copy the retrieved article)
+#   "draft"         -> a much smaller model sharing the Llama tokenizer
+ASSIST_MODES = ("prompt_lookup", "draft")
+DEFAULT_ASSIST = os.getenv("DELORES_ASSIST") or None
+DRAFT_MODEL_ID = MODEL_IDS["draft"]
+PROMPT_LOOKUP_TOKENS = int(os.getenv("DELORES_PROMPT_LOOKUP_TOKENS", "10"))
+
+# Generation limits. TinyLlama's context window is 2048 tokens (prompt + answer).
+MAX_CONTEXT_TOKENS = 2048
+DEFAULT_MAX_NEW_TOKENS = 256
+# Largest budget a client may ask for (requests above it are rejected by the API)
+MAX_NEW_TOKENS = 1024
+# The model tends to continue with a new chat turn or a new "Question:"/"User:" once it has answered
+DEFAULT_STOP_SEQUENCES = ["<|user|>", "<|system|>", "\nQuestion:", "\nUser:"]
+# Client stop sequences are rescanned against the tail on every token, so keep them few and short
+MAX_STOP_SEQUENCES = 8
+MAX_STOP_SEQUENCE_LENGTH = 64
+
+class StopOnEventOrSequences(StoppingCriteria):
+    """Stops generate() when cancel_event is set (e.g. client disconnected) or a stop sequence appears."""
+
+    def __init__(self, tokenizer, prompt_length, stop_sequences=None, cancel_event=None, tail_tokens=16):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_sequences = stop_sequences or []
+        self.cancel_event = cancel_event
+        self.tail_tokens = tail_tokens
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return True
+        if not self.stop_sequences:
+            return False
+        # Only decode the tail of the answer; stop sequences are short
+        start = max(self.prompt_length, input_ids.shape[1] - self.tail_tokens)
+        tail = self.tokenizer.decode(input_ids[0, start:], skip_special_tokens=False)
+        return any(stop in tail for stop in self.stop_sequences)
+
+def _find_stop(text, stop_sequences):
+    """Index of the earliest stop sequence in text, or None."""
+    positions = [text.find(stop) for stop in stop_sequences if stop in text]
+    return min(positions) if positions else None
+
+def _partial_stop_length(text, stop_sequences):
+    """Length of the longest suffix of text that could still grow into a stop sequence."""
+    longest = 0
+    for stop in stop_sequences:
+        for size in range(min(len(stop) - 1, len(text)), 0, -1):
+            if text.endswith(stop[:size]):
+                longest = max(longest, size)
+                break
+    return longest
+
 class LocalModelManager:
     _instance = None
     
@@ -22,6 +83,8 @@ class LocalModelManager:
             return
             
         logger.info("loading Local Models... This may take a while on first run.")
+        # Thread counts/affinity before any torch parallel work starts (see resources.py)
+        configure_resources("torch")
         
         # Determine device
         self.device = "cpu"
@@ -36,17 +99,31 @@ class LocalModelManager:
 
         # 1. Vision Model (BLIP)
         logger.info("   Loading Vision Model (BLIP)...")
-        self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-        self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base").to(self.device)
+        self.blip_processor = BlipProcessor.from_pretrained(model_path("vision"))
+        self.blip_model = BlipForConditionalGeneration.from_pretrained(model_path("vision")).to(self.device)
         
         # 2. Text Embedding Model
         logger.info("   Loading Embedding Model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2', device=self.device)
+        self.embedding_model = SentenceTransformer(model_path("embedding"), device=self.device)
+        
+        # Draft model for assisted generation is loaded lazily on first use
+        self.draft_model = None
+        self.tokenizer = None
+        self.llm_model = None
         
-        # 3. LLM (TinyLlama - Small & Fast)
+        # 3. LLM (TinyLlama - Small & Fast), unless answers come from an external server
+        if GENERATION_BACKEND != "local":
+            logger.info(f"   Skipping LLM: generation backend is '{GENERATION_BACKEND}'.")
+            self._initialized = True
+            logger.info("✅ Local Models Loaded Successfully.")
+            return
         logger.info("   Loading LLM (TinyLlama)...")
-        model_id = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
+        model_id = model_path("llm")
         self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        # Batched generation pads on the left so every prompt ends where decoding starts
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
         
         # Use float16 for CUDA, float32 for CPU
         torch_dtype = torch.float16 if self.device == "cuda" else torch.float32
@@ -61,7 +138,7 @@ class LocalModelManager:
         logger.info("✅ All Local Models Loaded Successfully.")
 
     def caption_image(self, image: Image):
-        """Generates a text caption for a PIL Image."""
+        """Generates a text caption for a PIL Image, or None when captioning fails."""
         try:
             inputs = self.blip_processor(image, return_tensors="pt").to(self.device)
             out = self.blip_model.generate(**inputs, max_new_tokens=50)
@@ -69,39 +146,158 @@ class LocalModelManager:
             return caption
         except Exception as e:
             logger.error(f"Error captioning image: {e}")
-            return "Image could not be processed."
+            return None
+
+    def caption_images(self, images, batch_size=8):
+        """
+        Generates captions for a list of PIL Images using batched BLIP forward passes.
+        Images that can't be captioned get None, so callers don't cache the failure.
+        """
+        captions = []
+        for i in range(0, len(images), batch_size):
+            batch = images[i:i + batch_size]
+            try:
+                inputs = self.blip_processor(images=batch, return_tensors="pt").to(self.device)
+                out = self.blip_model.generate(**inputs, max_new_tokens=50)
+                captions.extend(self.blip_processor.batch_decode(out, skip_special_tokens=True))
+            except Exception as e:
+                # One bad image shouldn't lose the whole batch
+                logger.error(f"Error captioning image batch, retrying one by one: {e}")
+                captions.extend(self.caption_image(image) for image in batch)
+        return captions
 
     def embed_text(self, text):
         """Generates embedding vector for text."""
         return self.embedding_model.encode(text).tolist()
     
-    def generate_response(self, prompt):
+    def _format_prompt(self, prompt):
+        return f"<|system|>\nYou are Delores, a helpful assistant for Irembo.<|user|>\n{prompt}<|assistant|>\n"
+
+    def _token_budget(self, prompt_length, max_new_tokens=None):
+        """Caps the requested budget by what is left of the context window."""
+        budget = max_new_tokens or DEFAULT_MAX_NEW_TOKENS
+        return max(1, min(budget, MAX_CONTEXT_TOKENS - prompt_length))
+
+    def generate_response(self, prompt, max_new_tokens=None, stop_sequences=None):
         """Generates full text response from LLM (Blocking)."""
-        formatted_prompt = f"<|system|>\nYou are Delores, a helpful assistant for Irembo.<|user|>\n{prompt}<|assistant|>\n"
+        formatted_prompt = self._format_prompt(prompt)
         inputs = self.tokenizer(formatted_prompt, return_tensors="pt").to(self.device)
+        prompt_length = inputs["input_ids"].shape[1]
+        stop_sequences = DEFAULT_STOP_SEQUENCES if stop_sequences is None else stop_sequences
         
-        outputs = self.llm_model.generate(**inputs, max_new_tokens=256, temperature=0.7, do_sample=True)
-        return self.tokenizer.decode(outputs[0], skip_special_tokens=True).split("<|assistant|>\n")[-1].strip()
+        stopping = StopOnEventOrSequences(self.tokenizer, prompt_length, stop_sequences)
+        outputs = self.llm_model.generate(
+            **inputs,
+            max_new_tokens=self._token_budget(prompt_length, max_new_tokens),
+            temperature=0.7,
+            do_sample=True,
+            stopping_criteria=StoppingCriteriaList([stopping])
+        )
+        text = self.tokenizer.decode(outputs[0], skip_special_tokens=True).split("<|assistant|>\n")[-1]
+        cut = _find_stop(text, stop_sequences)
+        return (text[:cut] if cut is not None else text).strip()
+
+    def generate_batch(self, prompts, max_new_tokens=None, stop_sequences=None, batch_size=4):
+        """
+        Generates responses for several prompts with padded, batched generate() calls (Blocking).
+        Stop sequences are applied to the decoded text, since stopping criteria act on the whole batch.
+        """
+        stop_sequences = DEFAULT_STOP_SEQUENCES if stop_sequences is None else stop_sequences
+        responses = []
+        for i in range(0, len(prompts), batch_size):
+            batch = [self._format_prompt(p) for p in prompts[i:i + batch_size]]
+            inputs = self.tokenizer(batch, return_tensors="pt", padding=True).to(self.device)
+            prompt_length = inputs["input_ids"].shape[1]
+            
+            outputs = self.llm_model.generate(
+                **inputs,
+                max_new_tokens=self._token_budget(prompt_length, max_new_tokens),
+                temperature=0.7,
+                do_sample=True,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+            for text in self.tokenizer.batch_decode(outputs[:, prompt_length:], skip_special_tokens=True):
+                cut = _find_stop(text, stop_sequences)
+                responses.append((text[:cut] if cut is not None else text).strip())
+        return responses
 
-    def generate_response_stream(self, prompt):
-        """Generates text response from LLM (Streaming)."""
-        formatted_prompt = f"<|system|>\nYou are Delores, a helpful assistant for Irembo.<|user|>\n{prompt}<|assistant|>\n"
+    def _load_draft_model(self):
+        if self.draft_model is None:
+            logger.info(f"   Loading draft model for assisted generation ({DRAFT_MODEL_ID})...")
+            self.draft_model = AutoModelForCausalLM.from_pretrained(
+                model_path("draft"),
+                torch_dtype=self.llm_model.dtype,
+                device_map=self.device
+            )
+        return self.draft_model
+
+    def _assist_kwargs(self, assist):
+        """Extra generate() kwargs for the requested assisted-generation mode."""
+        assist = assist or DEFAULT_ASSIST
+        if not assist:
+            return {}
+        if assist not in ASSIST_MODES:
+            raise ValueError(f"Unknown assist mode '{assist}'. Expected one of {ASSIST_MODES}.")
+        if assist == "prompt_lookup":
+            return {"prompt_lookup_num_tokens": PROMPT_LOOKUP_TOKENS}
+        return {"assistant_model": self._load_draft_model()}
+
+    def generate_response_stream(self, prompt, assist=None, max_new_tokens=None, stop_sequences=None, cancel_event=None):
+        """
+        Generates text response from LLM (Streaming).
+        assist: None, "prompt_lookup" or "draft" to enable assisted generation for this call.
+        max_new_tokens: per-request budget, capped by the remaining context window.
+        stop_sequences: generation ends (and the text is cut) at the first match.
+        cancel_event: threading.Event; setting it stops generate() at the next decode step.
+        Closing this generator early also stops generation.
+        """
+        formatted_prompt = self._format_prompt(prompt)
         inputs = self.tokenizer(formatted_prompt, return_tensors="pt").to(self.device)
+        prompt_length = inputs["input_ids"].shape[1]
+        stop_sequences = DEFAULT_STOP_SEQUENCES if stop_sequences is None else stop_sequences
+        cancel_event = cancel_event or Event()
         
         streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        stopping = StopOnEventOrSequences(self.tokenizer, prompt_length, stop_sequences, cancel_event)
         generation_kwargs = dict(
             **inputs, 
             streamer=streamer, 
-            max_new_tokens=256, 
+            max_new_tokens=self._token_budget(prompt_length, max_new_tokens), 
             temperature=0.7, 
-            do_sample=True
+            do_sample=True,
+            stopping_criteria=StoppingCriteriaList([stopping]),
+            **self._assist_kwargs(assist)
         )
         
-        thread = Thread(target=self.llm_model.generate, kwargs=generation_kwargs)
+        thread = Thread(target=profiling.propagate(self.llm_model.generate, "generate"), kwargs=generation_kwargs)
         thread.start()
         
-        for new_text in streamer:
-            yield new_text
+        # Hold back any tail that might be the start of a stop sequence so it never reaches the client
+        pending = ""
+        try:
+            for new_text in streamer:
+                pending += new_text
+                cut = _find_stop(pending, stop_sequences)
+                if cut is not None:
+                    if pending[:cut]:
+                        yield pending[:cut]
+                    pending = ""
+                    break
+                keep = _partial_stop_length(pending, stop_sequences)
+                if len(pending) > keep:
+                    yield pending[:len(pending) - keep]
+                    pending = pending[len(pending) - keep:]
+            if pending:
+                yield pending
+        finally:
+            # Stop decoding if we hit a stop sequence or the consumer went away
+            cancel_event.set()
+
+# Global instance. With DELORES_MODEL_HOST set, this process only holds a thin client
+# and the weights live once in the model-host process (see model_host.py).
+from .model_client import MODEL_HOST_ADDRESS, RemoteModelManager
 
-# Global instance
-local_models = LocalModelManager()
+if MODEL_HOST_ADDRESS:
+    local_models = RemoteModelManager(MODEL_HOST_ADDRESS)
+else:
+    local_models = LocalModelManager()
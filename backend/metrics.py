@@ -26,14 +26,37 @@ class MetricsManager:
                 sources TEXT,
                 latency_ms REAL,
                 ttft_ms REAL,
-                feedback_score INTEGER
+                feedback_score INTEGER,
+                top_score REAL,
+                answer_mode TEXT,
+                load_mode TEXT
+            )
+        ''')
+        # Databases created before retrieval scores / serving modes were logged
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(chat_logs)")]
+        if "top_score" not in columns:
+            cursor.execute("ALTER TABLE chat_logs ADD COLUMN top_score REAL")
+        for column in ("answer_mode", "load_mode"):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE chat_logs ADD COLUMN {column} TEXT")
+        
+        # Sampled CPU profiles of individual requests (see profiling.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS profiles (
+                request_id TEXT PRIMARY KEY,
+                timestamp DATETIME,
+                interval_ms REAL,
+                duration_ms REAL,
+                samples INTEGER,
+                collapsed TEXT
             )
         ''')
         
         conn.commit()
         conn.close()
 
-    def log_interaction(self, query: str, response: str, sources: list, latency_ms: float, ttft_ms: float = 0.0) -> str:
+    def log_interaction(self, query: str, response: str, sources: list, latency_ms: float, ttft_ms: float = 0.0, top_score: float = None,
+                        answer_mode: str = None, load_mode: str = None) -> str:
         """
         Log a chat interaction to the database.
         Returns the request_id.
@@ -45,9 +68,9 @@ class MetricsManager:
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO chat_logs (id, timestamp, query, response, sources, latency_ms, ttft_ms, feedback_score)
-            VALUES (?, ?, ?, ?, ?, ?, ?, NULL)
-        ''', (request_id, timestamp, query, response, json.dumps(sources), latency_ms, ttft_ms))
+            INSERT INTO chat_logs (id, timestamp, query, response, sources, latency_ms, ttft_ms, feedback_score, top_score, answer_mode, load_mode)
+            VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?, ?, ?)
+        ''', (request_id, timestamp, query, response, json.dumps(sources), latency_ms, ttft_ms, top_score, answer_mode, load_mode))
         
         conn.commit()
         conn.close()
@@ -66,3 +89,35 @@ class MetricsManager:
         
         conn.commit()
         conn.close()
+
+    def scored_feedback(self) -> list:
+        """(top_score, feedback_score) for every rated interaction that logged a retrieval score."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT top_score, feedback_score FROM chat_logs
+            WHERE top_score IS NOT NULL AND feedback_score IS NOT NULL
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+
+    def save_profile(self, request_id: str, collapsed: str, interval_ms: float, duration_ms: float, samples: int):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO profiles (request_id, timestamp, interval_ms, duration_ms, samples, collapsed)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (request_id, datetime.now().isoformat(), interval_ms, duration_ms, samples, collapsed))
+        conn.commit()
+        conn.close()
+
+    def get_profile(self, request_id: str):
+        """The stored profile row as a dict, or None."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM profiles WHERE request_id = ?", (request_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
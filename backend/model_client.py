@@ -0,0 +1,120 @@
+import os
+import logging
+import secrets
+from multiprocessing.connection import Client
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# When set, HTTP workers talk to a shared model-host process (see model_host.py)
+# over this Unix socket instead of loading their own copies of the models.
+MODEL_HOST_ADDRESS = os.getenv("DELORES_MODEL_HOST")
+
+def key_path(socket_path):
+    return socket_path + ".key"
+
+def model_host_authkey(socket_path, create=False):
+    """
+    Shared secret for the model-host socket. The host unpickles what authenticated peers send,
+    so there is no default: DELORES_MODEL_HOST_KEY, else a random key the host writes to
+    <socket>.key (mode 0600) and workers of the same user read back.
+    """
+    key = os.getenv("DELORES_MODEL_HOST_KEY")
+    if key:
+        return key.encode()
+    path = key_path(socket_path)
+    if create:
+        key = secrets.token_hex(32)
+        if os.path.exists(path):
+            os.remove(path)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(key)
+        return key.encode()
+    if not os.path.exists(path):
+        raise RuntimeError(f"No model host key: set DELORES_MODEL_HOST_KEY or start the model host first (it writes {path})")
+    with open(path, "r") as f:
+        return f.read().strip().encode()
+
+class RemoteModelManager:
+    """
+    Drop-in replacement for LocalModelManager that forwards every call to the model host.
+    Opens one short-lived connection per call, so it is safe to share across threads.
+    """
+
+    def __init__(self, address=MODEL_HOST_ADDRESS, authkey=None):
+        self.address = address
+        self.authkey = authkey
+
+    def _connect(self):
+        # Read lazily, so workers can be imported before the host has written its key file
+        if self.authkey is None:
+            self.authkey = model_host_authkey(self.address)
+        return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+
+    def _call(self, method, **kwargs):
+        with self._connect() as conn:
+            conn.send((method, kwargs))
+            status, payload = conn.recv()
+        if status == "error":
+            raise RuntimeError(f"Model host error in {method}: {payload}")
+        return payload
+
+    def caption_image(self, image):
+        return self._call("caption_image", image=image)
+
+    def caption_images(self, images, batch_size=8):
+        return self._call("caption_images", images=images, batch_size=batch_size)
+
+    def embed_text(self, text):
+        return self._call("embed_text", text=text)
+
+    def embed_documents(self, texts):
+        return self._call("embed_documents", texts=texts)
+
+    def generate_response(self, prompt, **kwargs):
+        return self._call("generate_response", prompt=prompt, **kwargs)
+
+    def generate_batch(self, prompts, **kwargs):
+        return self._call("generate_batch", prompts=prompts, **kwargs)
+
+    def generate_response_stream(self, prompt, cancel_event=None, **kwargs):
+        """Streams tokens from the host. Setting cancel_event (or closing the generator) cancels remotely."""
+        conn = self._connect()
+        finished = False
+        try:
+            conn.send(("generate_response_stream", dict(prompt=prompt, **kwargs)))
+            while True:
+                # Poll so a local cancel can be forwarded while waiting for the next token
+                if not conn.poll(0.05):
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    continue
+                status, payload = conn.recv()
+                if status == "token":
+                    yield payload
+                elif status == "end":
+                    finished = True
+                    break
+                else:
+                    finished = True
+                    raise RuntimeError(f"Model host error in generate_response_stream: {payload}")
+        finally:
+            if not finished:
+                try:
+                    conn.send(("cancel", {}))
+                except (OSError, EOFError):
+                    pass
+            conn.close()
+
+class RemoteEmbeddings(Embeddings):
+    """LangChain embeddings backed by the model host's MiniLM (same vectors as HuggingFaceEmbeddings)."""
+
+    def __init__(self, manager=None):
+        self.manager = manager or RemoteModelManager()
+
+    def embed_documents(self, texts):
+        return self.manager.embed_documents(list(texts))
+
+    def embed_query(self, text):
+        return self.manager.embed_documents([text])[0]
@@ -0,0 +1,100 @@
+"""
+Model host: loads TinyLlama, BLIP and MiniLM once and serves them to any number of
+HTTP worker processes over a Unix socket.
+
+    python -m backend.model_host --socket /tmp/delores-models.sock
+    DELORES_MODEL_HOST=/tmp/delores-models.sock uvicorn backend.server:app --workers 4
+"""
+import os
+import sys
+import logging
+import argparse
+from threading import Thread, Event
+from multiprocessing.connection import Listener
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.local_model import LocalModelManager
+from backend.model_client import model_host_authkey
+from backend.resources import log_effective_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/delores-models.sock"
+
+def stream_tokens(models, conn, kwargs):
+    """Streams tokens back to the worker, stopping generation if it sends a cancel message."""
+    cancel_event = Event()
+    for token in models.generate_response_stream(cancel_event=cancel_event, **kwargs):
+        if conn.poll():
+            method, _ = conn.recv()
+            if method == "cancel":
+                cancel_event.set()
+                return
+        conn.send(("token", token))
+    conn.send(("end", None))
+
+def handle_connection(models, conn):
+    try:
+        method, kwargs = conn.recv()
+        if method == "generate_response_stream":
+            stream_tokens(models, conn, kwargs)
+        elif method == "generate_response":
+            conn.send(("ok", models.generate_response(**kwargs)))
+        elif method == "generate_batch":
+            conn.send(("ok", models.generate_batch(**kwargs)))
+        elif method == "caption_image":
+            conn.send(("ok", models.caption_image(kwargs["image"])))
+        elif method == "caption_images":
+            conn.send(("ok", models.caption_images(kwargs["images"], batch_size=kwargs.get("batch_size", 8))))
+        elif method == "embed_text":
+            conn.send(("ok", models.embed_text(kwargs["text"])))
+        elif method == "embed_documents":
+            # Mirror HuggingFaceEmbeddings so vectors match the ones in faiss_index
+            texts = [t.replace("\n", " ") for t in kwargs["texts"]]
+            conn.send(("ok", models.embedding_model.encode(texts).tolist()))
+        else:
+            conn.send(("error", f"Unknown method '{method}'"))
+    except (EOFError, BrokenPipeError, ConnectionResetError):
+        pass  # Worker went away (e.g. client disconnected mid-stream)
+    except Exception as e:
+        logger.error(f"❌ Model host request failed: {e}")
+        try:
+            conn.send(("error", str(e)))
+        except OSError:
+            pass
+    finally:
+        conn.close()
+
+def serve(socket_path):
+    models = LocalModelManager()
+    log_effective_config()
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    authkey = model_host_authkey(socket_path, create=True)
+
+    # Socket only reachable by this user (created 0600, not world-connectable)
+    old_umask = os.umask(0o177)
+    try:
+        listener = Listener(socket_path, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(old_umask)
+    os.chmod(socket_path, 0o600)
+
+    with listener:
+        logger.info(f"✅ Model host listening on {socket_path}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning(f"⚠️ Rejected connection: {e}")
+                continue
+            Thread(target=handle_connection, args=(models, conn), daemon=True).start()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the local models to HTTP workers over a Unix socket.")
+    parser.add_argument("--socket", default=os.getenv("DELORES_MODEL_HOST", DEFAULT_SOCKET))
+    args = parser.parse_args()
+    serve(args.socket)
@@ -0,0 +1,51 @@
+import os
+import json
+from urllib.parse import urlparse
+
+from .scraper import TARGETS, TARGET_PRODUCTS, DEFAULT_PRODUCT
+from .language import DEFAULT_LANGUAGE
+
+# Below this top retrieval score (cosine) the question is treated as off-topic/unanswerable:
+# a templated reply is streamed and the LLM is never called.
+# Resolution order: DELORES_NO_ANSWER_THRESHOLD, then the calibration file, then the default.
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluation", "no_answer_calibration.json")
+DEFAULT_NO_ANSWER_THRESHOLD = 0.25
+
+NO_ANSWER_TEMPLATES = {
+    "en": "I couldn't find anything about this in the Irembo help center, so I'd rather not guess. "
+          "You can browse the help centers directly:\n{links}",
+    "fr": "Je n'ai rien trouvé à ce sujet dans le centre d'aide Irembo, je préfère donc ne pas deviner. "
+          "Vous pouvez consulter directement les centres d'aide :\n{links}",
+    "rw": "Nta makuru kuri iki kibazo nabonye mu bufasha bwa Irembo, sinifuza kubabwira ibidahamye. "
+          "Mushobora gusura ahatangirwa ubufasha:\n{links}",
+}
+
+def load_no_answer_threshold(path=CALIBRATION_PATH):
+    env_value = os.getenv("DELORES_NO_ANSWER_THRESHOLD")
+    if env_value:
+        return float(env_value)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return float(json.load(f)["threshold"])
+    return DEFAULT_NO_ANSWER_THRESHOLD
+
+def portal_links(product=None):
+    """Help-center homepages from scraper.TARGETS; the requested product's portal comes first."""
+    links = []
+    for url in TARGETS:
+        parsed = urlparse(url)
+        links.append({
+            "title": f"{TARGET_PRODUCTS.get(parsed.netloc, DEFAULT_PRODUCT)} help center",
+            "url": url,
+            "product": TARGET_PRODUCTS.get(parsed.netloc, DEFAULT_PRODUCT),
+        })
+    if product:
+        links.sort(key=lambda link: link["product"] != product)
+    return links
+
+def no_answer_response(language=DEFAULT_LANGUAGE, product=None):
+    """Localized fallback reply (en/fr/rw) plus the links it mentions."""
+    links = portal_links(product)
+    template = NO_ANSWER_TEMPLATES.get(language, NO_ANSWER_TEMPLATES[DEFAULT_LANGUAGE])
+    text = template.format(links="\n".join(f"- {link['title']}: {link['url']}" for link in links))
+    return text, links
@@ -0,0 +1,83 @@
+import sys
+import os
+import json
+import time
+import shutil
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.snapshot import MODEL_IDS, SNAPSHOT_FILE
+from backend.index_manifest import read_manifest
+
+# Writes a serving snapshot: every model re-saved as safetensors (memory-mapped on load) with its
+# fast tokenizer (tokenizer.json), plus a copy of the FAISS index, described by snapshot.json.
+# Serve from it with:
+#   DELORES_SNAPSHOT=/srv/delores-snapshot uvicorn backend.server:app
+
+def save_transformers_model(model_cls, processor_cls, model_id, out_dir):
+    model_cls.from_pretrained(model_id).save_pretrained(out_dir, safe_serialization=True)
+    processor_cls.from_pretrained(model_id).save_pretrained(out_dir)
+
+def prepare(output_dir, index_path="faiss_index", include_draft=False):
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    from transformers import BlipForConditionalGeneration, BlipProcessor
+    from sentence_transformers import SentenceTransformer
+    import torch
+    import transformers
+
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    roles = ["vision", "embedding", "llm"] + (["draft"] if include_draft else [])
+    models = {}
+
+    for role in roles:
+        model_id = MODEL_IDS[role]
+        out_dir = os.path.join(output_dir, "models", role)
+        print(f"📦 {role} model ({model_id})...")
+        if role == "embedding":
+            SentenceTransformer(model_id).save(out_dir, safe_serialization=True)
+        elif role == "vision":
+            save_transformers_model(BlipForConditionalGeneration, BlipProcessor, model_id, out_dir)
+        else:
+            save_transformers_model(AutoModelForCausalLM, AutoTokenizer, model_id, out_dir)
+        models[role] = {"id": model_id, "path": os.path.join("models", role)}
+
+    snapshot_index = None
+    index_version = None
+    if os.path.exists(index_path):
+        print(f"📦 FAISS index ({index_path})...")
+        snapshot_index = "faiss_index"
+        target = os.path.join(output_dir, snapshot_index)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        shutil.copytree(index_path, target)
+        # The manifest is copied along; record its version so snapshots can be told apart
+        index_manifest = read_manifest(target)
+        index_version = index_manifest["index_version"] if index_manifest else None
+    else:
+        print(f"⚠️ No index at {index_path}; the server will start without knowledge.")
+
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "models": models,
+        "index_path": snapshot_index,
+        "index_version": index_version,
+        "versions": {"torch": torch.__version__, "transformers": transformers.__version__},
+    }
+    with open(os.path.join(output_dir, SNAPSHOT_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Snapshot written to {output_dir} in {time.perf_counter() - start:.1f}s")
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare a serving snapshot (local safetensors models, tokenizers and index).")
+    parser.add_argument("output", help="Snapshot directory, later passed as DELORES_SNAPSHOT")
+    parser.add_argument("--index-path", default="faiss_index")
+    parser.add_argument("--draft", action="store_true", help="Also include the draft model for assisted generation")
+    args = parser.parse_args()
+    prepare(args.output, args.index_path, args.draft)
+
+if __name__ == "__main__":
+    main()
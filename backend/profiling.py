@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Opt-in, per-request sampling profiler. A background thread snapshots the stacks of the threads
+# working on one request (the request's threadpool thread, the token pump and the generate() thread)
+# through sys._current_frames(), and aggregates them into collapsed stacks ("a;b;c count") for
+# flame graphs. Triggered by the X-Delores-Profile header, ?profile=1, or DELORES_PROFILE_SAMPLE_RATE.
+
+PROFILE_HEADER = "x-delores-profile"
+PROFILE_SAMPLE_RATE = float(os.getenv("DELORES_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("DELORES_PROFILE_INTERVAL", "0.005"))  # seconds between samples
+MAX_STACK_DEPTH = 128
+
+# thread id -> profiler currently attached to that thread
+_attached = {}
+
+def should_profile(header_value=None, query_value=None, sample_rate=PROFILE_SAMPLE_RATE):
+    if (header_value or query_value or "").lower() in ("1", "true", "yes"):
+        return True
+    return sample_rate > 0 and random.random() < sample_rate
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()  # (role, frame, frame, ...) root first -> count
+        self._threads = {}  # thread id -> role
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self.started_at = None
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="delores-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        if self._stop.is_set():
+            return self
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def add_thread(self, thread_id, role):
+        with self._lock:
+            self._threads[thread_id] = role
+
+    def remove_thread(self, thread_id):
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = dict(self._threads)
+            frames = sys._current_frames()
+            for thread_id, role in threads.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.samples[(role,) + tuple(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed format: one "frame;frame;frame count" line per distinct stack."""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.samples.most_common())
+
+def collapsed_to_speedscope(collapsed, name, interval):
+    """Converts collapsed stacks to a speedscope "sampled" profile (weights in milliseconds)."""
+    frames, frame_index = [], {}
+    samples, weights = [], []
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(" ")
+        indices = []
+        for label in stack.split(";"):
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            indices.append(frame_index[label])
+        samples.append(indices)
+        weights.append(int(count) * interval * 1000)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "delores",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+def current():
+    """Profiler attached to the calling thread, if any."""
+    return _attached.get(threading.get_ident())
+
+@contextmanager
+def attached(profiler, role):
+    """Samples the calling thread for the duration of the block (no-op when profiler is None)."""
+    if profiler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    _attached[thread_id] = profiler
+    profiler.add_thread(thread_id, role)
+    try:
+        yield
+    finally:
+        profiler.remove_thread(thread_id)
+        _attached.pop(thread_id, None)
+
+def propagate(target, role):
+    """Wraps a thread target so the new thread is sampled by the caller's profiler too."""
+    profiler = current()
+    if profiler is None:
+        return target
+
+    def run(*args, **kwargs):
+        with attached(profiler, role):
+            return target(*args, **kwargs)
+    return run
@@ -2,122 +2,581 @@ from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
-from .local_model import local_models
+from .local_model import local_models, DEFAULT_STOP_SEQUENCES
+from .model_client import MODEL_HOST_ADDRESS, RemoteEmbeddings
+from .embedding_cache import CachedEmbeddings, EmbeddingCache
+from .language import detect_language
+from .scraper import product_for_url, DEFAULT_PRODUCT
+from .sessions import condense_query, format_history
+from .no_answer import load_no_answer_threshold, no_answer_response
+from . import chunking
+from .dedup import dedup_documents, SIMHASH_THRESHOLD
+from .generation import get_generation_backend
+from .resources import configure_resources
+from .degradation import AnswerCache, cache_key, SHORT_BUDGET
+from . import index_manifest
+from . import snapshot
 import os
+import re
+import time
+from contextlib import nullcontext
+import faiss
+import numpy as np
+
+EMBEDDING_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Answer budgets by question type. Step-by-step procedures need room; short factual
+# questions ("when", "how much", yes/no) rarely need more than a couple of sentences.
+PROCEDURAL_BUDGET = 256
+FACTUAL_BUDGET = 96
+DEFAULT_BUDGET = 160
+PROCEDURAL_PATTERN = re.compile(r"^(how (do|can|to)|what are the steps|steps|procedure|process|comment|nigute)\b|\b(apply|register|renew|steps?|procedure)\b", re.IGNORECASE)
+FACTUAL_PATTERN = re.compile(r"^(what is|what's|who|when|where|which|how (much|long|many)|is|are|can|do|does|quand|où|qui|combien|quel|quelle|ryari|angahe)\b", re.IGNORECASE)
+
+# Retrieval is restricted to the query's language (and product) partition; partitions smaller
+# than this are relaxed (language first, then product) down to the whole index.
+LANGUAGE_ROUTING = os.getenv("DELORES_LANGUAGE_ROUTING", "1") == "1"
+MIN_PARTITION_CHUNKS = int(os.getenv("DELORES_MIN_PARTITION_CHUNKS", "20"))
+# Metadata fields that get a pre-filterable id set
+PARTITION_FIELDS = ("language", "product", "category", "folder")
+
+# Chunks less similar than this (cosine) are dropped before prompting. Whether the question is
+# answered at all is decided on the top score against the calibrated no-answer threshold.
+MIN_SIMILARITY = float(os.getenv("DELORES_MIN_SIMILARITY", "0.1"))
+
+# Extractive answers (no LLM): the retrieved sentence/step closest to the query, grown into a span
+# of neighbours scoring within EXTRACTIVE_SPAN_MARGIN of it (a whole run for numbered steps)
+EXTRACTIVE_MAX_CHARS = 600
+EXTRACTIVE_SPAN_MARGIN = 0.1
+ANSWER_MODES = ("generative", "extractive")
+STEP_PATTERN = re.compile(r"^\s*(\d+[.)]|[-*•])\s+")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-ZÀ-Ý0-9])")
+
+def split_units(text):
+    """Splits a chunk body into (unit, is_step) pairs: one per list item, else one per sentence."""
+    units = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if STEP_PATTERN.match(line):
+            units.append((line, True))
+        else:
+            units.extend((sentence, False) for sentence in SENTENCE_SPLIT.split(line) if sentence)
+    return units
+
+def token_budget_for_query(query):
+    """Picks max_new_tokens from the shape of the question."""
+    query = query.strip()
+    if PROCEDURAL_PATTERN.search(query):
+        return PROCEDURAL_BUDGET
+    if FACTUAL_PATTERN.search(query):
+        return FACTUAL_BUDGET
+    return DEFAULT_BUDGET
 
 class RAGPipeline:
     def __init__(self):
+        # FAISS (and, for in-process embeddings, torch) thread counts; see resources.py
+        configure_resources(*(("faiss",) if MODEL_HOST_ADDRESS else ("faiss", "torch")))
         self.vector_store = None
-        # Use HuggingFace local embeddings
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        # From faiss_index/manifest.json; keys the answer cache and is reported with every answer
+        self.index_manifest = None
+        self.index_version = None
+        # (metadata field, value) -> FAISS ids of the chunks in that partition
+        self.partitions = {}
+        self._selectors = {}
+        # FAISS id -> chunk Document, so hot-path lookups skip the docstore/id-map dicts
+        self.chunk_table = np.empty(0, dtype=object)
+        # Use HuggingFace local embeddings, or the shared model host's copy when configured
+        if MODEL_HOST_ADDRESS:
+            self.embeddings = RemoteEmbeddings(local_models)
+        else:
+            self.embeddings = HuggingFaceEmbeddings(model_name=snapshot.model_path("embedding", EMBEDDING_MODEL_ID))
+        # Chunk embeddings are reused across rebuilds; only new/changed chunks hit the model
+        self.embedding_cache = EmbeddingCache()
+        self.no_answer_threshold = load_no_answer_threshold()
+        # In-process TinyLlama or an OpenAI-compatible server (DELORES_GENERATION_BACKEND)
+        self.generator = get_generation_backend()
+        # Generated answers, served again when load shedding (see degradation.py)
+        self.answer_cache = AnswerCache()
         
-    def initialize_vector_store(self, documents):
+    def initialize_vector_store(self, documents, chunk_size=1000, chunk_overlap=200, index_path="faiss_index",
+                                strategy=chunking.CHUNK_STRATEGY, max_tokens=chunking.STRUCTURE_MAX_TOKENS, use_cache=True):
         """
         Ingest documents into FAISS vector store.
+        strategy: "structure" (headings/steps, max_tokens embedding-model tokens per chunk, see chunking.py)
+        or "recursive" (chunk_size/chunk_overlap characters).
+        Pass index_path=None to build in memory only (e.g. for benchmarks), and use_cache=False to
+        embed every chunk without reading or writing the persistent embedding cache.
         """
         if not documents:
             return
+        if strategy not in chunking.CHUNK_STRATEGIES:
+            raise ValueError(f"strategy must be one of {chunking.CHUNK_STRATEGIES}")
             
         print(f"Ingesting {len(documents)} documents locally...")
         
+        # Language is detected per article and inherited by its chunks
+        for doc in documents:
+            if "language" not in doc.metadata:
+                doc.metadata["language"] = detect_language(doc.page_content)
+        
         # Split documents into chunks
-        from langchain.text_splitter import RecursiveCharacterTextSplitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        split_docs = text_splitter.split_documents(documents)
-        print(f"   -> Split into {len(split_docs)} chunks.")
-        
-        self.vector_store = FAISS.from_documents(split_docs, self.embeddings)
-        self.vector_store.save_local("faiss_index")
-        print("Ingestion complete and index saved.")
-
-    def load_vector_store(self):
-        if os.path.exists("faiss_index"):
-            self.vector_store = FAISS.load_local("faiss_index", self.embeddings, allow_dangerous_deserialization=True)
-
-    def retrieve(self, query, k=2): # Reduced k to fit in context
-        if not self.vector_store:
-            return []
-        return self.vector_store.similarity_search(query, k=k)
+        if strategy == "structure":
+            split_docs = chunking.split_documents(documents, max_tokens=max_tokens)
+        else:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_function=len,
+            )
+            split_docs = text_splitter.split_documents(documents)
+        print(f"   -> Split into {len(split_docs)} chunks ({strategy}).")
+        # Near-identical chunks (boilerplate, articles republished across portals) are embedded once
+        split_docs, dropped = dedup_documents(split_docs)
+        print(f"   -> {dropped} near-duplicate chunks merged, {len(split_docs)} left.")
+        
+        if use_cache:
+            cached_embeddings = CachedEmbeddings(self.embeddings, EMBEDDING_MODEL_ID, self.embedding_cache)
+            self.vector_store = FAISS.from_documents(split_docs, cached_embeddings)
+            stats = cached_embeddings.stats()
+            print(f"   -> Embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate).")
+        else:
+            self.vector_store = FAISS.from_documents(split_docs, self.embeddings)
+        self.build_partitions()
+        
+        if strategy == "structure":
+            chunk_config = {"strategy": strategy, "max_tokens": max_tokens, "min_tokens": chunking.STRUCTURE_MIN_TOKENS}
+        else:
+            chunk_config = {"strategy": strategy, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+        chunk_config["dedup_threshold"] = SIMHASH_THRESHOLD
+        manifest = index_manifest.build_manifest(EMBEDDING_MODEL_ID, self.vector_store.index.d, chunk_config,
+                                                 documents, len(split_docs))
+        if index_path:
+            self.vector_store.save_local(index_path)
+            manifest = index_manifest.write_manifest(index_path, manifest)
+            print(f"Ingestion complete and index saved (version {manifest['index_version']}).")
+        self.index_manifest = manifest
+        self.index_version = manifest["index_version"]
 
-    def answer_query(self, query, language="en"):
-        if not self.vector_store:
-            return {
-                "response": "I am not yet initialized with knowledge. Please trigger a scrape first.",
-                "sources": [],
-                "language": language
-            }
+    def load_vector_store(self, index_path=None):
+        """
+        Loads a saved index after checking it against its manifest.json: file checksums before
+        anything is unpickled, then the embedding model and dimension (IndexManifestError on mismatch).
+        """
+        # The serving snapshot's copy of the index, if there is one
+        index_path = index_path or snapshot.index_path()
+        if not os.path.exists(index_path):
+            return
+        manifest = index_manifest.read_manifest(index_path)
+        if manifest is None:
+            print(f"⚠️ {index_path} has no {index_manifest.MANIFEST_FILE} (built before manifests); loading it unchecked. Rebuild to add one.")
+        else:
+            index_manifest.verify_files(index_path, manifest)
+        vector_store = FAISS.load_local(index_path, self.embeddings, allow_dangerous_deserialization=True)
+        if manifest is not None:
+            index_manifest.verify_compatible(manifest, EMBEDDING_MODEL_ID, vector_store.index.d)
+        self.vector_store = vector_store
+        self.index_manifest = manifest
+        self.index_version = manifest["index_version"] if manifest else index_manifest.legacy_version(index_path)
+        self.build_partitions()
+
+    def build_partitions(self):
+        """
+        Groups FAISS ids by metadata value so searches can be pre-filtered with an IDSelector,
+        and fills the id -> chunk table used by search_vectors().
+        Chunks from indexes built before language/product tagging are backfilled here.
+        """
+        partitions = {}
+        chunk_table = np.empty(self.vector_store.index.ntotal, dtype=object)
+        for faiss_id, doc_id in self.vector_store.index_to_docstore_id.items():
+            doc = self.vector_store.docstore.search(doc_id)
+            chunk_table[faiss_id] = doc
+            if "language" not in doc.metadata:
+                doc.metadata["language"] = detect_language(doc.page_content)
+            if doc.metadata.get("product", DEFAULT_PRODUCT) == DEFAULT_PRODUCT:
+                doc.metadata["product"] = product_for_url(doc.metadata.get("source"))
+            for field in PARTITION_FIELDS:
+                values = [doc.metadata.get(field)]
+                if field == "product":
+                    # A deduplicated chunk belongs to every product it was published under
+                    values += doc.metadata.get("products") or []
+                for value in set(v for v in values if v):
+                    partitions.setdefault((field, value), []).append(faiss_id)
+        self.partitions = {key: np.array(ids, dtype=np.int64) for key, ids in partitions.items()}
+        self.chunk_table = chunk_table
+        self._selectors = {}
 
-        # 1. Retrieve
-        docs = self.retrieve(query)
+    def _partition_ids(self, filters):
+        """Intersection of the id sets for every (field, value) filter, or None if unknown."""
+        ids = None
+        for key in filters.items():
+            part = self.partitions.get(key)
+            if part is None:
+                return None
+            ids = part if ids is None else np.intersect1d(ids, part, assume_unique=True)
+        return ids
+
+    def _selector(self, filters):
+        # Values come from clients: unknown ones are never cached, so the cache stays bounded
+        # by the partitions that actually exist
+        if any(key not in self.partitions for key in filters.items()):
+            return None
+        key = tuple(sorted(filters.items()))
+        if key not in self._selectors:
+            ids = self._partition_ids(filters)
+            if len(ids) < MIN_PARTITION_CHUNKS:
+                self._selectors[key] = None
+            else:
+                # The selector only holds a pointer, so keep the id array alive alongside it
+                self._selectors[key] = (faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)), ids)
+        entry = self._selectors[key]
+        return entry[0] if entry else None
+
+    def _route(self, language=None, product=None, filters=None):
+        """
+        Picks the narrowest usable selector, relaxing sparse partitions:
+        language+product -> product -> language -> whole index (None).
+        """
+        base = dict(filters or {})
+        if product:
+            base["product"] = product
+        use_language = language and LANGUAGE_ROUTING
+        candidates = []
+        if base and use_language:
+            candidates.append(dict(base, language=language))
+        if base:
+            candidates.append(base)
+        if use_language:
+            candidates.append({"language": language})
+        for candidate in candidates:
+            selector = self._selector(candidate)
+            if selector is not None:
+                return selector
+        return None
+
+    def search_vectors(self, query_vectors, k=2, selector=None, min_score=None):
+        """
+        Raw top-k over the FAISS index for a (n, dim) float32 query matrix.
+        Returns (scores, ids) arrays of shape (n, k); scores are cosine similarities
+        and ids that are missing or below min_score are -1.
+        """
+        params = faiss.SearchParameters(sel=selector) if selector is not None else None
+        distances, ids = self.vector_store.index.search(query_vectors, k, params=params)
+        if self.vector_store.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            scores = distances
+        else:
+            # Squared L2 between unit vectors: cosine = 1 - d / 2
+            scores = 1.0 - distances / 2.0
+        if min_score is not None:
+            ids[scores < min_score] = -1
+        return scores, ids
+
+    def _embed_queries(self, queries):
+        if len(queries) == 1:
+            return np.array([self.embeddings.embed_query(queries[0])], dtype=np.float32)
+        return np.array(self.embeddings.embed_documents(list(queries)), dtype=np.float32)
+
+    def retrieve_batch_with_scores(self, queries, k=2, language=None, product=None, filters=None, min_score=None):
+        """
+        Top-k (chunk, score) pairs for every query, pre-filtered to the language/product partition
+        (plus any extra {field: value} filters, e.g. category or folder).
+        One embedding call and one FAISS search for the whole batch.
+        """
+        if not self.vector_store or not queries:
+            return [[] for _ in queries]
         
-        # 2. Context Construction & Truncation
-        # TinyLlama has 2048 token limit. We limit context to ~1500 tokens (approx 6000 chars)
+        selector = self._route(language, product, filters)
+        scores, ids = self.search_vectors(self._embed_queries(queries), k, selector, min_score)
+        results = []
+        for row_ids, row_scores in zip(ids, scores):
+            keep = row_ids != -1
+            results.append(list(zip(self.chunk_table[row_ids[keep]], row_scores[keep].tolist())))
+        return results
+
+    def retrieve_with_scores(self, query, k=2, language=None, product=None, filters=None, min_score=None):
+        return self.retrieve_batch_with_scores([query], k, language, product, filters, min_score)[0]
+
+    def retrieve(self, query, k=2, language=None, product=None, filters=None, min_score=None): # Reduced k to fit in context
+        """Top-k chunks for the query (see retrieve_batch_with_scores)."""
+        return [doc for doc, _ in self.retrieve_with_scores(query, k, language, product, filters, min_score)]
+
+    def retrieve_batch(self, queries, k=2, language=None, product=None, filters=None, min_score=None):
+        """retrieve() for many queries at once."""
+        return [
+            [doc for doc, _ in hits]
+            for hits in self.retrieve_batch_with_scores(queries, k, language, product, filters, min_score)
+        ]
+
+    def format_sources(self, docs, scores=None):
+        sources = [
+            {
+                "title": d.metadata.get("title", "Unknown"),
+                "url": d.metadata.get("source", "#"),
+                "product": d.metadata.get("product", DEFAULT_PRODUCT),
+                "category": d.metadata.get("category"),
+                "source_urls": d.metadata.get("source_urls") or [d.metadata.get("source", "#")],
+            }
+            for d in docs
+        ]
+        if scores is not None:
+            for source, score in zip(sources, scores):
+                source["score"] = round(score, 4)
+        return sources
+
+    def warm_up(self):
+        """
+        One retrieval and a few generated tokens, so the first real request doesn't pay for
+        lazy kernel initialisation. Returns the time spent in seconds.
+        """
+        start = time.perf_counter()
+        query = "How do I apply for a passport?"
+        docs = self.retrieve(query) if self.vector_store else []
+        prompt = self.build_prompt(docs, query)
+        "".join(self.generator.generate_stream(prompt, max_new_tokens=8))
+        return time.perf_counter() - start
+
+    def is_answerable(self, scores):
+        """True when the best retrieved chunk clears the no-answer threshold."""
+        return bool(scores) and scores[0] >= self.no_answer_threshold
+
+    def extractive_answer(self, query, docs):
+        """
+        Answers without the LLM: scores every sentence and list step of the retrieved chunks against
+        the query (one embedding batch, query included) and returns (span text, its chunk, score).
+        """
+        units, owners = [], []
+        for doc_index, doc in enumerate(docs):
+            text = doc.page_content
+            # Structure chunks start with a "Title > Section" line, which is not answer text
+            if doc.metadata.get("has_header"):
+                text = text.split("\n", 1)[1]
+            for unit in split_units(text):
+                units.append(unit)
+                owners.append(doc_index)
+        if not units:
+            return "", docs[0], 0.0
+
+        vectors = self._embed_queries([query] + [text for text, _ in units])
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        scores = vectors[1:] @ vectors[0]
+        best = int(np.argmax(scores))
+
+        # Grow the span over neighbours from the same chunk. A step (or a "To apply:" lead-in)
+        # takes the whole list with it, so procedures are never cut in the middle.
+        procedure = units[best][1] or units[best][0].endswith(":")
+
+        def joins(i):
+            if i < 0 or i >= len(units) or owners[i] != owners[best]:
+                return False
+            if procedure:
+                return units[i][1] or (i == start - 1 and units[i][0].endswith(":"))
+            return scores[i] >= scores[best] - EXTRACTIVE_SPAN_MARGIN
+
+        start = end = best
+        length = len(units[best][0])
+        while True:
+            grown = False
+            for i in (end + 1, start - 1):
+                if joins(i) and length + len(units[i][0]) <= EXTRACTIVE_MAX_CHARS:
+                    length += len(units[i][0]) + 1
+                    start, end = min(start, i), max(end, i)
+                    grown = True
+            if not grown:
+                break
+        separator = "\n" if procedure else " "
+        span = separator.join(text for text, _ in units[start:end + 1])
+        return span, docs[owners[best]], float(scores[best])
+
+    def build_prompt(self, docs, query, history=None):
+        """Builds the grounded prompt from retrieved chunks (and recent conversation turns, if any)."""
+        # TinyLlama has 2048 token limit. We limit context + history to ~1500 tokens (approx 6000 chars)
+        history_text = format_history(history) if history else ""
         raw_context = "\n\n".join([d.page_content for d in docs])
-        context = raw_context[:6000] 
+        context = raw_context[:6000 - len(history_text)]
         
-        # 3. Prompt construction
-        prompt = f"""You are Delores, a helpful assistant for Irembo services.
+        conversation = f"Conversation so far:\n{history_text}\n\n" if history_text else ""
+        
+        return f"""You are Delores, a helpful assistant for Irembo services.
 Answer the question based ONLY on the context below.
 If the answer is not in the context, say "I don't know."
 
 Context:
 {context}
 
-Question: {query}
+{conversation}Question: {query}
 
 Answer:"""
+
+    def answer_query(self, query, language="en", product=None, answer_mode="generative"):
+        if not self.vector_store:
+            return {
+                "response": "I am not yet initialized with knowledge. Please trigger a scrape first.",
+                "sources": [],
+                "language": language,
+                "index_version": self.index_version
+            }
+
+        # 1. Retrieve (within the language/product partition when it is large enough)
+        hits = self.retrieve_with_scores(query, language=language, product=product, min_score=MIN_SIMILARITY)
+        docs = [doc for doc, _ in hits]
+        if not self.is_answerable([score for _, score in hits]):
+            # Off-topic: don't spend a generation on "I don't know"
+            response_text, _ = no_answer_response(language, product)
+            return {"response": response_text, "sources": [], "language": language, "index_version": self.index_version}
         
-        # 3. Generate using Local LLM
-        response_text = local_models.generate_response(prompt)
+        if answer_mode == "extractive":
+            response_text, doc, _ = self.extractive_answer(query, docs)
+            return {"response": response_text, "sources": self.format_sources([doc]), "language": language,
+                    "index_version": self.index_version}
+        
+        # 2. Context Construction, Truncation & Prompt
+        prompt = self.build_prompt(docs, query)
+        
+        # 3. Generate (local LLM or generation server)
+        response_text = self.generator.generate(prompt, max_new_tokens=token_budget_for_query(query))
         
         # 4. Format Output
-        sources = [{"title": d.metadata.get("title", "Unknown"), "url": d.metadata.get("source", "#"), "product": "Irembo"} for d in docs]
+        sources = self.format_sources(docs)
         
         return {
             "response": response_text,
             "sources": sources,
-            "language": language
+            "language": language,
+            "index_version": self.index_version
         }
 
-    def answer_query_stream(self, query, language="en"):
+    def iter_answer_batch(self, queries, language="en", product=None, max_new_tokens=None, batch_size=4, generation_slot=None):
+        """
+        Answers many queries with batched retrieval and padded batched generation.
+        Yields one result dict per query (in order) as each generation batch finishes.
+        generation_slot: optional context manager factory (e.g. a scheduler slot) held around
+        each generate_batch call, and only there.
+        """
         if not self.vector_store:
-            yield '{"error": "I am not yet initialized with knowledge. Please trigger a scrape first."}'
+            for query in queries:
+                yield {"query": query, "response": "I am not yet initialized with knowledge. Please trigger a scrape first.", "sources": [], "language": language, "index_version": self.index_version}
             return
-
-        # 1. Retrieve
-        docs = self.retrieve(query)
         
-        # 2. Context Construction & Truncation
-        raw_context = "\n\n".join([d.page_content for d in docs])
-        context = raw_context[:6000] 
+        # 1. Retrieve for every query at once
+        all_hits = self.retrieve_batch_with_scores(queries, language=language, product=product, min_score=MIN_SIMILARITY)
+        all_docs = [[doc for doc, _ in hits] if self.is_answerable([score for _, score in hits]) else [] for hits in all_hits]
+        no_answer_text, _ = no_answer_response(language, product)
         
-        # 3. Prompt construction
-        prompt = f"""You are Delores, a helpful assistant for Irembo services.
-Answer the question based ONLY on the context below.
-If the answer is not in the context, say "I don't know."
+        # 2. Generate batch by batch, with a budget large enough for the most demanding question.
+        # Off-topic queries get the templated reply and never reach the model.
+        for start in range(0, len(queries), batch_size):
+            batch_queries = queries[start:start + batch_size]
+            batch_docs = all_docs[start:start + batch_size]
+            answerable = [i for i, docs in enumerate(batch_docs) if docs]
+            responses = [no_answer_text] * len(batch_queries)
+            if answerable:
+                prompts = [self.build_prompt(batch_docs[i], batch_queries[i]) for i in answerable]
+                budget = max_new_tokens or max(token_budget_for_query(batch_queries[i]) for i in answerable)
+                with generation_slot() if generation_slot else nullcontext():
+                    generated = self.generator.generate_batch(prompts, max_new_tokens=budget, batch_size=batch_size)
+                for i, response_text in zip(answerable, generated):
+                    responses[i] = response_text
+            
+            for query, docs, response_text in zip(batch_queries, batch_docs, responses):
+                yield {
+                    "query": query,
+                    "response": response_text,
+                    "sources": self.format_sources(docs),
+                    "language": language,
+                    "index_version": self.index_version
+                }
 
-Context:
-{context}
+    def answer_batch(self, queries, language="en", product=None, max_new_tokens=None, batch_size=4):
+        """Blocking version of iter_answer_batch, returning the list of results."""
+        return list(self.iter_answer_batch(queries, language, product, max_new_tokens, batch_size))
 
-Question: {query}
+    def answer_query_stream(self, query, language="en", assist=None, max_new_tokens=None, stop_sequences=None, cancel_event=None, product=None, history=None, mode="normal", answer_mode="generative"):
+        """
+        Yields a metadata JSON line, then the answer text. answer_mode="extractive" answers with
+        the best-matching span of the retrieved chunks instead of generating. mode comes from the
+        load policy (degradation.py): "short" caps the budget, "extractive" falls back to an
+        extractive answer, and "cache_only" serves a cached answer when there is one (else extractive).
+        """
+        if not self.vector_store:
+            yield '{"error": "I am not yet initialized with knowledge. Please trigger a scrape first."}'
+            return
 
-Answer:"""
-        
-        # 4. Prepare Metadata
-        sources = [{"title": d.metadata.get("title", "Unknown"), "url": d.metadata.get("source", "#"), "product": "Irembo"} for d in docs]
         import json
+        # Answers to follow-ups depend on the conversation, so they are neither cached nor served from cache
+        key = cache_key(query, language, product, self.index_version) if not history else None
+        if mode != "normal" and key is not None:
+            cached = self.answer_cache.get(key)
+            if cached is not None:
+                response_text, sources = cached
+                yield json.dumps({"sources": sources, "language": language, "answer_mode": "cached", "load_mode": mode,
+                                  "index_version": self.index_version}) + "\n"
+                yield response_text
+                return
+
+        # 1. Retrieve (within the language/product partition when it is large enough).
+        # Follow-ups are anchored to the previous question so retrieval sees a standalone query.
+        search_query = condense_query(query, history)
+        hits = self.retrieve_with_scores(search_query, language=language, product=product, min_score=MIN_SIMILARITY)
+        docs = [doc for doc, _ in hits]
+        scores = [score for _, score in hits]
+        answerable = self.is_answerable(scores)
+        
+        # 2. Prepare Metadata
+        if mode not in ("normal", "short"):
+            answer_mode = "extractive"
         metadata = {
-            "sources": sources,
-            "language": language
+            "sources": self.format_sources(docs, scores),
+            "language": language,
+            "top_score": scores[0] if scores else None,
+            "answer_mode": answer_mode,
+            "load_mode": mode,
+            "index_version": self.index_version
         }
+        if not answerable:
+            no_answer_text, links = no_answer_response(language, product)
+            metadata.update(sources=[], answer_mode="no_answer", links=links)
+        
+        if answer_mode == "extractive" and answerable:
+            # Fast enough to run before the metadata, which then names the span's own chunk
+            span, doc, span_score = self.extractive_answer(search_query, docs)
+            metadata.update(sources=self.format_sources([doc], [scores[docs.index(doc)]]), span_score=round(span_score, 4))
         
         # Yield metadata as the first line
         yield json.dumps(metadata) + "\n"
         
-        # 5. Generate Stream
-        for token in local_models.generate_response_stream(prompt):
+        if not answerable:
+            # Off-topic: answer immediately instead of generating "I don't know"
+            yield no_answer_text
+            return
+        
+        if answer_mode == "extractive":
+            yield span
+            return
+        
+        # 3. Context Construction, Truncation & Prompt
+        prompt = self.build_prompt(docs, query, history)
+        budget = max_new_tokens or token_budget_for_query(query)
+        if mode == "short":
+            budget = min(budget, SHORT_BUDGET)
+        
+        # 4. Generate Stream
+        tokens = []
+        for token in self.generator.generate_stream(
+            prompt,
+            assist=assist,
+            max_new_tokens=budget,
+            stop_sequences=stop_sequences,
+            cancel_event=cancel_event
+        ):
+            tokens.append(token)
             yield token
+        
+        # Cached answers are served to everyone asking the same question under load, so only store
+        # complete answers generated with the default settings: normal mode, the question's own
+        # budget, the default stop sequences, no assist, not cut short by a disconnect
+        default_settings = (mode == "normal" and max_new_tokens is None and assist is None
+                            and stop_sequences in (None, DEFAULT_STOP_SEQUENCES))
+        if key is not None and default_settings and tokens and not (cancel_event and cancel_event.is_set()):
+            self.answer_cache.put(key, "".join(tokens), metadata["sources"])
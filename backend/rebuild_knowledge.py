@@ -5,13 +5,14 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.scraper import scrape_portal
+from backend.corpus import CorpusStore
 from backend.rag import RAGPipeline
 
 def rebuild():
     print("🚀 Starting Knowledge Base Rebuild...")
     
-    # 1. Scrape
-    docs = scrape_portal()
+    # 1. Scrape (raw pages are kept in backend/corpus for offline replay)
+    docs = scrape_portal(corpus=CorpusStore())
     
     # 2. Ingest
     if docs:
@@ -0,0 +1,54 @@
+import sys
+import os
+import time
+import json
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.corpus import CorpusStore, CORPUS_DIR, extract_stored_page
+from backend.scraper import finalize_articles, article_to_document, EXTRACTION_WORKERS
+from backend.rag import RAGPipeline
+from backend.dedup import dedup_documents
+
+def replay(root=CORPUS_DIR, skip_images=True, workers=EXTRACTION_WORKERS):
+    """Re-extracts every stored article page from the raw corpus (no network) and returns Documents."""
+    corpus = CorpusStore(root)
+    pages = corpus.pages(kind="article")
+    print(f"📦 Replaying {len(pages)} stored article pages from {root} with {workers} workers...")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(extract_stored_page, [root] * len(pages), [p["sha256"] for p in pages], [p["final_url"] for p in pages])
+        extracted = list(zip([p["url"] for p in pages], results))
+
+    selector_stats = Counter()
+    article_info = {p["url"]: json.loads(p["meta"] or "{}") for p in pages}
+    articles = finalize_articles(extracted, skip_images=skip_images, selector_stats=selector_stats, article_info=article_info)
+    print(f"   -> Extracted {len(articles)} articles in {time.perf_counter() - start:.1f}s")
+    print(f"   🧭 Body selector usage: {dict(selector_stats.most_common())}")
+    docs, dropped = dedup_documents([article_to_document(a) for a in articles])
+    print(f"   🧬 Merged {dropped} near-duplicate articles.")
+    return docs
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the knowledge base from the raw page corpus, without re-crawling.")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--images", action="store_true", help="Add image captions (cached captions are reused; others are downloaded)")
+    parser.add_argument("--workers", type=int, default=EXTRACTION_WORKERS)
+    parser.add_argument("--index-path", default="faiss_index")
+    args = parser.parse_args()
+
+    docs = replay(args.corpus, skip_images=not args.images, workers=args.workers)
+    if docs:
+        rag = RAGPipeline()
+        rag.initialize_vector_store(docs, index_path=args.index_path)
+        print("✅ Rebuild from corpus complete!")
+    else:
+        print("❌ No documents found in corpus. Run rebuild_knowledge.py first to record one.")
+
+if __name__ == "__main__":
+    main()
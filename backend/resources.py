@@ -0,0 +1,108 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# CPU budget per component. Without limits, torch (TinyLlama + MiniLM), FAISS's OpenMP pool,
+# the HF tokenizers pool and uvicorn's threadpool each size themselves to every core and fight
+# over them. Unset values keep the library defaults, except FAISS and tokenizers whose pools
+# only add contention for single-query searches and short texts.
+#   DELORES_CPU_AFFINITY    cores this process may run on, e.g. "0-5" for the model host and "6,7" for API workers
+#   DELORES_TORCH_THREADS   torch intra-op threads (default: number of cores in the affinity set)
+#   DELORES_TORCH_INTEROP_THREADS
+#   DELORES_FAISS_THREADS   FAISS OpenMP threads (default 1)
+#   DELORES_TOKENIZERS_PARALLELISM ("false" by default)
+#   DELORES_API_THREADS     uvicorn/anyio threadpool size for sync endpoints
+
+_applied = set()
+
+def parse_cpu_list(value):
+    """"0-3,6" -> {0, 1, 2, 3, 6}"""
+    cpus = set()
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+def _int_env(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+def resource_config():
+    """Requested settings, from the environment."""
+    return {
+        "cpu_affinity": parse_cpu_list(os.getenv("DELORES_CPU_AFFINITY")) or None,
+        "torch_threads": _int_env("DELORES_TORCH_THREADS"),
+        "torch_interop_threads": _int_env("DELORES_TORCH_INTEROP_THREADS"),
+        "faiss_threads": _int_env("DELORES_FAISS_THREADS") or 1,
+        "tokenizers_parallelism": os.getenv("DELORES_TOKENIZERS_PARALLELISM", "false"),
+        "api_threads": _int_env("DELORES_API_THREADS"),
+    }
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def apply_affinity(config):
+    # Set before the torch/OpenMP pools spawn their threads, which inherit it
+    if config["cpu_affinity"] and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, config["cpu_affinity"])
+
+def apply_torch(config):
+    import torch
+    torch.set_num_threads(config["torch_threads"] or available_cpus())
+    if config["torch_interop_threads"]:
+        try:
+            torch.set_num_interop_threads(config["torch_interop_threads"])
+        except RuntimeError:
+            # Only allowed before the first inter-op parallel work
+            logger.warning("⚠️ torch inter-op threads already started; DELORES_TORCH_INTEROP_THREADS ignored.")
+
+def apply_faiss(config):
+    import faiss
+    faiss.omp_set_num_threads(config["faiss_threads"])
+
+def configure_resources(*components):
+    """
+    Applies the thread/affinity settings for the given components ("torch", "faiss").
+    Idempotent per component; affinity and tokenizer settings are applied once per process.
+    """
+    config = resource_config()
+    if "process" not in _applied:
+        apply_affinity(config)
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", config["tokenizers_parallelism"])
+        _applied.add("process")
+    for component in components:
+        if component in _applied:
+            continue
+        {"torch": apply_torch, "faiss": apply_faiss}[component](config)
+        _applied.add(component)
+    return config
+
+def effective_config():
+    """What the libraries actually run with (for startup logs and benchmarks)."""
+    report = {
+        "cpus_available": available_cpus(),
+        "cpu_count": os.cpu_count(),
+        "tokenizers_parallelism": os.getenv("TOKENIZERS_PARALLELISM"),
+    }
+    if hasattr(os, "sched_getaffinity"):
+        report["cpu_affinity"] = sorted(os.sched_getaffinity(0))
+    if "torch" in _applied:
+        import torch
+        report["torch_threads"] = torch.get_num_threads()
+        report["torch_interop_threads"] = torch.get_num_interop_threads()
+    if "faiss" in _applied:
+        import faiss
+        report["faiss_threads"] = faiss.omp_get_max_threads()
+    return report
+
+def log_effective_config():
+    logger.info(f"🧵 CPU resources: {effective_config()}")
@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Admission control and scheduling for generation.
+#  - Per-client token buckets (API key, else IP) reject floods with 429 before any work is done.
+#  - A fixed number of generation slots; waiting requests are queued per priority class and
+#    dispatched by weighted fair queueing (stride scheduling over the classes), so a scripted
+#    batch job gets its share without starving interactive users.
+#  - Slots can be reserved for interactive traffic, so a long batch generation never holds them all.
+
+PRIORITY_WEIGHTS = {"interactive": 8, "batch": 2, "evaluation": 1}
+DEFAULT_PRIORITY = "interactive"
+# Two slots by default, one of them reserved, so a batch generation never holds the only slot
+GENERATION_SLOTS = int(os.getenv("DELORES_GENERATION_SLOTS", "2"))
+INTERACTIVE_RESERVED_SLOTS = int(os.getenv("DELORES_INTERACTIVE_RESERVED_SLOTS", "1" if GENERATION_SLOTS > 1 else "0"))
+CLIENT_RATE = float(os.getenv("DELORES_CLIENT_RATE", "1.0"))  # requests per second, sustained
+CLIENT_BURST = float(os.getenv("DELORES_CLIENT_BURST", "10"))
+QUEUE_TIMEOUT = float(os.getenv("DELORES_QUEUE_TIMEOUT", "30"))  # seconds
+# API keys that get their own quota and may pick their scheduling class; any other key is ignored
+TRUSTED_API_KEYS = frozenset(k.strip() for k in os.getenv("DELORES_API_KEYS", "").split(",") if k.strip())
+MAX_CLIENTS = 10000
+WAIT_WINDOW = 200  # recent queue waits kept per class for percentiles
+
+class QueueTimeout(Exception):
+    pass
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now, cost=1.0):
+        """
+        Returns 0 when admitted, otherwise the seconds until enough tokens are available.
+        A cost above the burst is admitted from a full bucket and leaves it in debt, so large
+        batches are possible but paid for before the client's next request.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+class GenerationScheduler:
+    def __init__(self, slots=GENERATION_SLOTS, weights=PRIORITY_WEIGHTS, reserved_interactive=INTERACTIVE_RESERVED_SLOTS,
+                 client_rate=CLIENT_RATE, client_burst=CLIENT_BURST, queue_timeout=QUEUE_TIMEOUT):
+        self.slots = slots
+        self.weights = dict(weights)
+        self.reserved_interactive = min(reserved_interactive, max(0, slots - 1))
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._buckets = {}  # client -> TokenBucket, bounded by MAX_CLIENTS
+        self._queues = {c: deque() for c in self.weights}
+        self._virtual_time = {c: 0.0 for c in self.weights}
+        self._active = {c: 0 for c in self.weights}
+        self._stats = {c: {"dispatched": 0, "rejected": 0, "timeouts": 0, "waits": deque(maxlen=WAIT_WINDOW)} for c in self.weights}
+
+    def admit(self, client_id, priority=DEFAULT_PRIORITY, cost=1.0):
+        """Token-bucket check. Returns 0 when admitted, else the suggested Retry-After in seconds."""
+        now = time.monotonic()
+        with self._cond:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                if len(self._buckets) >= MAX_CLIENTS:
+                    # Drop the longest-idle client; an idle bucket is full anyway
+                    oldest = min(self._buckets, key=lambda c: self._buckets[c].updated)
+                    del self._buckets[oldest]
+                bucket = self._buckets[client_id] = TokenBucket(self.client_rate, self.client_burst)
+            retry_after = bucket.take(now, cost)
+            if retry_after:
+                self._stats[priority]["rejected"] += 1
+            return retry_after
+
+    def _eligible(self, priority):
+        if not self._queues[priority]:
+            return False
+        if priority == DEFAULT_PRIORITY:
+            return True
+        background = sum(n for c, n in self._active.items() if c != DEFAULT_PRIORITY)
+        return background < self.slots - self.reserved_interactive
+
+    def _dispatch(self):
+        """Hands free slots to queue heads, lowest virtual time first. Caller holds the lock."""
+        while sum(self._active.values()) < self.slots:
+            candidates = [c for c in self.weights if self._eligible(c)]
+            if not candidates:
+                return
+            priority = min(candidates, key=lambda c: self._virtual_time[c])
+            ticket = self._queues[priority].popleft()
+            ticket["granted"] = True
+            self._active[priority] += 1
+            self._virtual_time[priority] += 1.0 / self.weights[priority]
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=DEFAULT_PRIORITY):
+        """Blocks until a generation slot is granted to this request (raises QueueTimeout)."""
+        ticket = {"granted": False}
+        enqueued_at = time.monotonic()
+        with self._cond:
+            if not self._queues[priority]:
+                # A class coming back from idle starts at the current virtual time (no banked credit)
+                busy = [self._virtual_time[c] for c in self.weights if self._queues[c] or self._active[c]]
+                if busy:
+                    self._virtual_time[priority] = max(self._virtual_time[priority], min(busy))
+            self._queues[priority].append(ticket)
+            self._dispatch()
+            deadline = enqueued_at + self.queue_timeout
+            while not ticket["granted"]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queues[priority].remove(ticket)
+                    self._stats[priority]["timeouts"] += 1
+                    raise QueueTimeout(f"No generation slot within {self.queue_timeout:g}s")
+                self._cond.wait(remaining)
+            stats = self._stats[priority]
+            stats["dispatched"] += 1
+            stats["waits"].append((time.monotonic() - enqueued_at) * 1000)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active[priority] -= 1
+                self._dispatch()
+
+    def queue_depth(self):
+        """Requests currently waiting for a generation slot, across all classes."""
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def stats(self):
+        with self._cond:
+            classes = {}
+            for c in self.weights:
+                waits = sorted(self._stats[c]["waits"])
+                classes[c] = {
+                    "weight": self.weights[c],
+                    "queued": len(self._queues[c]),
+                    "active": self._active[c],
+                    "dispatched": self._stats[c]["dispatched"],
+                    "rejected": self._stats[c]["rejected"],
+                    "timeouts": self._stats[c]["timeouts"],
+                    "wait_ms": {
+                        "p50": waits[len(waits) // 2] if waits else 0.0,
+                        "p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                    },
+                }
+            return {
+                "slots": self.slots,
+                "reserved_interactive": self.reserved_interactive,
+                "clients": len(self._buckets),
+                "classes": classes,
+            }
@@ -1,15 +1,21 @@
 import requests
 import logging
+import os
 import time
 from io import BytesIO
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from PIL import Image
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from langchain_core.documents import Document
 
 # Import our new Local Model Manager
 from .local_model import local_models
+from .caption_cache import CaptionCache, image_hash
+from .extraction import extract_article, parse_html
+from .language import detect_language
+from .dedup import dedup_documents
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -21,8 +27,26 @@ TARGETS = [
     "https://iremboplus.freshdesk.com"
 ]
 
-def get_soup(url):
-    """Fetches a URL with a browser-like User-Agent."""
+# Portal -> product id (matches the product ids used by the frontend and ChatRequest.product)
+TARGET_PRODUCTS = {
+    "iremboagent.freshdesk.com": "IremboGov",
+    "osc.freshdesk.com": "OSC",
+    "iremboplus.freshdesk.com": "IremboPlus",
+}
+DEFAULT_PRODUCT = "Irembo"
+
+def product_for_url(url):
+    """Maps an article/portal URL to its product via the portal host."""
+    return TARGET_PRODUCTS.get(urlparse(url or "").netloc.lower(), DEFAULT_PRODUCT)
+
+# HTML extraction is CPU-bound, so it runs on a process pool fed by the fetcher
+EXTRACTION_WORKERS = int(os.getenv("DELORES_EXTRACTION_WORKERS", os.cpu_count() or 2))
+
+def fetch_html(url, corpus=None, kind="page", site=None, meta=None):
+    """
+    Fetches a URL with a browser-like User-Agent. Returns (html_bytes, final_url) or (None, None).
+    When a CorpusStore is given, the raw page is recorded for offline re-extraction.
+    """
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -39,179 +63,125 @@ def get_soup(url):
             return None, None
             
         if resp.status_code == 200:
-            return BeautifulSoup(resp.content, 'html.parser'), resp.url
+            if corpus is not None:
+                corpus.put(url, resp.url, resp.content, headers=resp.headers, kind=kind, site=site, meta=meta)
+            return resp.content, resp.url
         logger.warning(f"      ⚠️ Status {resp.status_code} for {url}")
     except Exception as e:
         logger.error(f"      ⚠️ Connection error: {e}")
     return None, None
 
-def process_images_in_html(soup, base_url):
+def get_soup(url, corpus=None, site=None):
+    """Fetches and parses a (listing) page."""
+    html, real_url = fetch_html(url, corpus=corpus, kind="listing", site=site)
+    if html is None:
+        return None, None
+    return parse_html(html), real_url
+
+IMAGE_DOWNLOAD_WORKERS = 8
+IMAGE_HEADERS = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)'}  # Avoid 403 blocks on images
+
+caption_cache = CaptionCache()
+
+def download_image(url):
+    """Downloads image bytes, returning None on failure."""
+    try:
+        img_resp = requests.get(url, headers=IMAGE_HEADERS, timeout=5)
+        if img_resp.status_code == 200:
+            return img_resp.content
+        logger.warning(f"         ❌ Failed to download image {url} (Status {img_resp.status_code})")
+    except Exception as e:
+        logger.error(f"         ❌ Image download error for {url}: {e}")
+    return None
+
+def caption_image_urls(image_urls):
     """
-    Finds <img> tags, downloads them, generates captions using BLIP, 
-    and appends the description to the text.
+    Returns {url: caption} for the given image URLs.
+    Known URLs skip the download, known image bytes (same logo under another URL) skip BLIP,
+    the rest are downloaded concurrently and captioned in batches.
     """
-    captions = []
-    images = soup.find_all('img')
-    
-    if images:
-        logger.info(f"      Found {len(images)} images to process...")
-        
-    for img in images:
-        src = img.get('src')
-        if not src: continue
-        
-        full_img_url = urljoin(base_url, src)
+    captions = caption_cache.get_by_urls(image_urls)
+    missing = [u for u in image_urls if u not in captions]
+    if captions:
+        logger.info(f"      ♻️ {len(captions)} image captions served from cache")
+    if not missing:
+        return captions
+
+    # 1. Download concurrently
+    with ThreadPoolExecutor(max_workers=IMAGE_DOWNLOAD_WORKERS) as pool:
+        downloads = dict(zip(missing, pool.map(download_image, missing)))
+    hashes = {url: image_hash(content) for url, content in downloads.items() if content}
+
+    # 2. Same bytes already captioned under another URL
+    known = caption_cache.get_by_hashes(list(set(hashes.values())))
+    new_entries = []
+    to_caption = {}
+    for url, h in hashes.items():
+        if h in known:
+            captions[url] = known[h]
+            new_entries.append((url, h, None))
+        elif h not in to_caption:
+            to_caption[h] = url
+
+    # 3. Batch caption the genuinely new images
+    images, image_keys = [], []
+    for h, url in to_caption.items():
         try:
-            # Download image bytes
-            logger.info(f"      Processing Image: {full_img_url}...")
-            # Use headers to avoid 403 blocks on images
-            headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)'} 
-            img_resp = requests.get(full_img_url, headers=headers, timeout=5)
-            
-            if img_resp.status_code == 200:
-                image = Image.open(BytesIO(img_resp.content)).convert('RGB')
-                
-                # Generate Caption using Local BLIP Model
-                caption = local_models.caption_image(image)
-                captions.append(f"[Image Description: {caption}]")
-                logger.info(f"         ✅ Captioned: {caption}")
-            else:
-                logger.warning(f"         ❌ Failed to download image (Status {img_resp.status_code})")
-                
+            images.append(Image.open(BytesIO(downloads[url])).convert('RGB'))
+            image_keys.append(h)
         except Exception as e:
-            logger.error(f"         ❌ Image processing error: {e}")
-            
-    return "\n".join(captions)
+            logger.error(f"         ❌ Image processing error for {url}: {e}")
 
-def scrape_article_html(url, skip_images=True):
+    if images:
+        logger.info(f"      Captioning {len(images)} new images...")
+        # Failed captions (None) are left out: not cached, so the next ingestion retries them
+        new_captions = {h: c for h, c in zip(image_keys, local_models.caption_images(images)) if c is not None}
+        if len(new_captions) < len(image_keys):
+            logger.warning(f"      ⚠️ {len(image_keys) - len(new_captions)} images could not be captioned")
+        for url, h in hashes.items():
+            if h in new_captions:
+                captions[url] = new_captions[h]
+                new_entries.append((url, h, new_captions[h]))
+                logger.info(f"         ✅ Captioned: {new_captions[h]}")
+
+    caption_cache.put_many(new_entries)
+    return captions
+
+def build_article(data, captions=None):
     """
-    Enhanced article scraper with multiple selector strategies and better debugging.
+    Combines extracted text with image captions into the final article record.
+    Returns None when the content is too short to be useful.
     """
-    logger.info(f"   📄 Scraping Article: {url}")
-    soup, real_url = get_soup(url)
-    if not soup: 
-        logger.warning(f"      ❌ Failed to fetch HTML for {url}")
+    image_captions = ""
+    if captions:
+        image_captions = "\n".join(f"[Image Description: {captions[u]}]" for u in data["image_urls"] if u in captions)
+    
+    if image_captions:
+        final_content = f"{data['text']}\n\n--- Visual Context ---\n{image_captions}"
+    else:
+        final_content = data["text"]
+    
+    # Validate content length
+    if len(final_content.strip()) < 50:
+        logger.warning(f"      ⚠️ Content too short ({len(final_content)} chars) for {data['url']}")
         return None
-        
-    try:
-        # Extract Title
-        title = "No Title"
-        title_elem = soup.find('h1') or soup.find('h2', class_='article-title')
-        if title_elem:
-            title = title_elem.get_text(strip=True)
-        
-        # Strategy 1: Try multiple Freshdesk-specific selectors
-        body = None
-        selectors = [
-            # Freshdesk common selectors
-            {'class_': 'article-body'},
-            {'class_': 'fr-view'},  # Froala editor
-            {'class_': 'article-content'},
-            {'class_': 'solution-article-content'},
-            {'id': 'article-content'},
-            {'id': 'article-body'},
-            {'itemprop': 'articleBody'},
-            
-            # Generic content selectors
-            {'class_': 'description-text'},
-            {'class_': 'g-content'},
-            {'class_': 'fw-article-content'},
-            {'class_': 'content-body'},
-        ]
-        
-        for s in selectors:
-            body = soup.find('div', **s) or soup.find('section', **s)
-            if body and body.get_text(strip=True): 
-                logger.info(f"      ✅ Found body with selector: {s}")
-                break
-        
-        # Strategy 2: Try article tag
-        if not body or not body.get_text(strip=True):
-            body = soup.find('article')
-            if body and body.get_text(strip=True):
-                logger.info(f"      ✅ Found body with <article> tag")
-        
-        # Strategy 3: Find main content area
-        if not body or not body.get_text(strip=True):
-            body = soup.find('main')
-            if body and body.get_text(strip=True):
-                logger.info(f"      ✅ Found body with <main> tag")
-        
-        # Strategy 4: Debug - print available divs and try the most promising one
-        if not body or not body.get_text(strip=True):
-            logger.warning(f"      ⚠️ No content body found with standard selectors")
-            logger.info(f"      🔍 Analyzing page structure...")
-            
-            # Get all divs with classes and find the one with most text
-            all_divs = soup.find_all('div', class_=True)
-            best_div = None
-            max_text_length = 0
-            
-            for div in all_divs:
-                text = div.get_text(strip=True)
-                if len(text) > max_text_length and len(text) > 100:  # Minimum 100 chars
-                    # Avoid navigation, footer, header
-                    classes = ' '.join(div.get('class', []))
-                    if not any(skip in classes.lower() for skip in ['nav', 'menu', 'footer', 'header', 'sidebar']):
-                        max_text_length = len(text)
-                        best_div = div
-            
-            if best_div:
-                body = best_div
-                classes = ' '.join(best_div.get('class', []))
-                logger.info(f"      ✅ Found best content div with classes: {classes}")
-                logger.info(f"      ✅ Content length: {max_text_length} chars")
-            else:
-                # Last resort: dump some classes for debugging
-                sample_classes = [' '.join(d.get('class', [])) for d in all_divs[:10]]
-                logger.warning(f"      ⚠️ Sample div classes found: {sample_classes}")
-
-        if body:
-            # 1. Process Images BEFORE stripping tags
-            image_captions = ""
-            if not skip_images:
-                image_captions = process_images_in_html(body, real_url)
-            
-            # 2. Clean up junk
-            for s in body(["script", "style", "form", "button", "nav", "header", "footer"]): 
-                s.decompose()
-            
-            # Extract text
-            text = body.get_text(separator="\n", strip=True)
-            
-            # Clean up excessive whitespace
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            text = '\n'.join(lines)
-            
-            # 3. Combine Text + Image Captions
-            if image_captions:
-                final_content = f"{text}\n\n--- Visual Context ---\n{image_captions}"
-            else:
-                final_content = text
-            
-            # Validate content length
-            if len(final_content.strip()) < 50:
-                logger.warning(f"      ⚠️ Content too short ({len(final_content)} chars)")
-                return None
-            
-            logger.info(f"      ✅ Successfully extracted {len(final_content)} characters")
-            return {"title": title, "content": final_content, "url": real_url}
-        else:
-            logger.warning(f"      ⚠️ No usable content body found for {url}")
-            
-    except Exception as e:
-        logger.error(f"      ❌ Error parsing {url}: {e}")
-    return None
+    
+    return {"title": data["title"], "content": final_content, "url": data["url"]}
+
+def page_heading(soup):
+    heading = soup.find('h1') or soup.find('h2')
+    return heading.get_text(strip=True) if heading else None
 
-def crawl_freshdesk_portal(base_url):
+def crawl_freshdesk_portal(base_url, corpus=None, article_info=None):
     """
     Robust Crawler: Home -> Solutions/Categories -> Folders -> Articles
+    If article_info (a dict) is given, it is filled with {article_url: {"category", "folder"}}.
     """
     article_urls = set()
     
     # 1. Homepage
     logger.info(f"   🕷️ Connecting to {base_url}...")
-    soup, real_url = get_soup(base_url)
+    soup, real_url = get_soup(base_url, corpus, base_url)
     if not soup: return []
 
     # 2. Find Solutions Link
@@ -226,16 +196,16 @@ def crawl_freshdesk_portal(base_url):
         solutions_url = "https://support.irembo.gov.rw/support/solutions"
 
     logger.info(f"   🕷️ Checking Solutions Page: {solutions_url}")
-    soup, _ = get_soup(solutions_url)
+    soup, _ = get_soup(solutions_url, corpus, base_url)
     
     if not soup:
         logger.info("   ⚠️ Could not access solutions page, scanning homepage links instead...")
-        soup, _ = get_soup(real_url)
+        soup, _ = get_soup(real_url, corpus, base_url)
         if not soup:
             return []
 
-    # 3. Find Folders & Categories
-    folder_links = []
+    # 3. Find Folders & Categories (folder_url -> category name, when known)
+    folder_links = {}
     
     # Strategy A: Direct Folder Links
     for a in soup.find_all('a', href=True):
@@ -244,35 +214,38 @@ def crawl_freshdesk_portal(base_url):
         
         # Strategy A: Direct Folder Links
         if "/folders/" in href:
-            folder_links.append(full_link)
+            folder_links.setdefault(full_link, None)
 
         # Strategy B: Category Links OR Solution Groups -> Folders
         # Some portals use /solutions/<id> as a specific category
         elif "/categories/" in href or ("/solutions/" in href and "/articles/" not in href and any(c.isdigit() for c in href)):
             
+            category = a.get_text(strip=True) or None
+            
             # If it is a specific solution page, it might contain articles directly, so add it as a "folder"
             if "/solutions/" in href:
-                folder_links.append(full_link)
+                folder_links.setdefault(full_link, category)
 
             # Dig into category to find sub-folders
             try:
                 time.sleep(0.2)  # Be nice to the server
-                cat_soup, _ = get_soup(full_link)
+                cat_soup, _ = get_soup(full_link, corpus, base_url)
                 if cat_soup:
+                    category = category or page_heading(cat_soup)
                     for ca in cat_soup.find_all('a', href=True):
                         if "/folders/" in ca['href']:
-                            folder_links.append(urljoin(full_link, ca['href']))
+                            folder_links.setdefault(urljoin(full_link, ca['href']), category)
             except Exception as e:
                 logger.warning(f"      ⚠️ Failed to dig into category {full_link}: {e}")
             
-    folder_links = list(set(folder_links))
     logger.info(f"      Found {len(folder_links)} folders.")
 
     # 4. Dig into Folders to find Articles
-    for folder_url in folder_links:
+    for folder_url, category in folder_links.items():
         time.sleep(0.5)  # Rate limiting
-        f_soup, _ = get_soup(folder_url)
+        f_soup, _ = get_soup(folder_url, corpus, base_url)
         if not f_soup: continue
+        folder = page_heading(f_soup)
         
         count = 0
         for a in f_soup.find_all('a', href=True):
@@ -280,6 +253,8 @@ def crawl_freshdesk_portal(base_url):
                 full_art = urljoin(folder_url, a['href'])
                 if full_art not in article_urls:
                     article_urls.add(full_art)
+                    if article_info is not None:
+                        article_info[full_art] = {"category": category, "folder": folder}
                     count += 1
         
         if count > 0:
@@ -287,50 +262,113 @@ def crawl_freshdesk_portal(base_url):
         
     return list(article_urls)
 
-def scrape_portal(limit=None, skip_images=True):
+def extract_articles_parallel(urls, skip_images=True, pool=None, selector_stats=None, corpus=None, site=None, article_info=None):
+    """
+    Fetches pages on this thread and hands the CPU-bound HTML extraction to a process pool,
+    so parsing one page overlaps with fetching the next.
+    Images for all extracted articles are then captioned together.
+    Returns a list of article dicts (see build_article).
+    """
+    futures = []
+    for i, url in enumerate(urls):
+        logger.info(f"   📄 Fetching Article: {url}")
+        info = (article_info or {}).get(url)
+        html, real_url = fetch_html(url, corpus=corpus, kind="article", site=site, meta=info)
+        if html is None:
+            logger.info(f"      🗑️ Dropped {url} (Fetch failed)")
+        else:
+            futures.append((url, pool.submit(extract_article, html, real_url)))
+        
+        # Rate limiting - be respectful
+        if (i + 1) % 5 == 0: 
+            time.sleep(1)
+            logger.info(f"      💤 Rate limiting... ({i + 1}/{len(urls)} fetched)")
+    
+    extracted = [(url, future.result()) for url, future in futures]
+    return finalize_articles(extracted, skip_images=skip_images, selector_stats=selector_stats, article_info=article_info)
+
+def finalize_articles(extracted, skip_images=True, selector_stats=None, article_info=None):
+    """
+    Turns (url, extract_article result) pairs into article dicts:
+    drops empty pages, captions all images in one batch and applies build_article.
+    article_info ({url: {"category", "folder"}}, from the crawler) is merged into each article.
+    """
+    extracted_ok = []
+    for url, data in extracted:
+        if data:
+            extracted_ok.append((url, data))
+            if selector_stats is not None:
+                selector_stats[data["selector"]] += 1
+        else:
+            logger.info(f"      🗑️ Dropped {url} (No content body)")
+    extracted = extracted_ok
+    
+    captions = None
+    if not skip_images:
+        image_urls = list(dict.fromkeys(u for _, data in extracted for u in data["image_urls"]))
+        if image_urls:
+            logger.info(f"      Found {len(image_urls)} images to process...")
+            captions = caption_image_urls(image_urls)
+    
+    articles = []
+    for url, data in extracted:
+        article = build_article(data, captions)
+        if article:
+            article.update((article_info or {}).get(url) or {})
+            articles.append(article)
+        else:
+            logger.info(f"      🗑️ Dropped {data['url']} (Empty/Short)")
+    return articles
+
+def article_to_document(article):
+    return Document(
+        page_content=article["content"],
+        metadata={
+            "source": article["url"], 
+            "title": article["title"], 
+            "product": product_for_url(article["url"]),
+            "category": article.get("category"),
+            "folder": article.get("folder"),
+            "language": detect_language(article["content"])
+        }
+    )
+
+def scrape_portal(limit=None, skip_images=True, corpus=None):
     """
     Main scraping function that processes all target sites.
+    Pass a CorpusStore to keep the raw HTML for offline replay (see replay_corpus.py).
     """
     all_documents = []
+    selector_stats = Counter()
     
-    for site in TARGETS:
-        logger.info(f"\n🚀 Processing Site: {site}")
-        
-        # Crawl the portal to find article URLs
-        urls = crawl_freshdesk_portal(site)
-        
-        if site not in urls:
-            urls.insert(0, site)
+    with ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS) as pool:
+        for site in TARGETS:
+            logger.info(f"\n🚀 Processing Site: {site}")
             
-        logger.info(f"   🕷️ Found {len(urls)} articles (including homepage) to process.")
-        
-        count = 0
-        for i, url in enumerate(urls):
-            if limit and count >= limit:
-                break
+            # Crawl the portal to find article URLs (and their category/folder)
+            article_info = {}
+            urls = crawl_freshdesk_portal(site, corpus=corpus, article_info=article_info)
+            
+            if site not in urls:
+                urls.insert(0, site)
                 
-            data = scrape_article_html(url, skip_images=skip_images)
-            count += 1
+            logger.info(f"   🕷️ Found {len(urls)} articles (including homepage) to process.")
+            if limit:
+                urls = urls[:limit]
             
-            if data and len(data["content"]) > 50:
-                all_documents.append(Document(
-                    page_content=data["content"],
-                    metadata={
-                        "source": data["url"], 
-                        "title": data["title"], 
-                        "product": "Irembo"
-                    }
-                ))
+            articles = extract_articles_parallel(
+                urls, skip_images=skip_images, pool=pool, selector_stats=selector_stats,
+                corpus=corpus, site=site, article_info=article_info
+            )
+            for data in articles:
+                all_documents.append(article_to_document(data))
                 logger.info(f"      ✅ Added document: {data['title'][:50]}...")
-            else:
-                logger.info(f"      🗑️ Dropped {url} (Empty/Short)")
-            
-            # Rate limiting - be respectful
-            if (i + 1) % 5 == 0: 
-                time.sleep(1)
-                logger.info(f"      💤 Rate limiting... ({i + 1}/{len(urls)} processed)")
 
+    # Portals republish the same articles and every site adds its homepage: keep one copy
+    all_documents, dropped = dedup_documents(all_documents)
+    logger.info(f"   🧬 Merged {dropped} near-duplicate articles.")
     logger.info(f"\n🎉 TOTAL SCRAPED: {len(all_documents)} documents.")
+    logger.info(f"   🧭 Body selector usage: {dict(selector_stats.most_common())}")
     return all_documents
 
 if __name__ == "__main__":
@@ -1,14 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from .scraper import scrape_portal
-from .scraper import scrape_portal
-from .rag import RAGPipeline
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field, constr
+from . import snapshot  # before any model import: offline mode when serving from a snapshot
+from .scraper import scrape_portal, TARGET_PRODUCTS
+from .rag import RAGPipeline, ANSWER_MODES
 from .metrics import MetricsManager
+from .local_model import ASSIST_MODES, DEFAULT_STOP_SEQUENCES, MAX_NEW_TOKENS, MAX_STOP_SEQUENCES, MAX_STOP_SEQUENCE_LENGTH
+from .sessions import SessionStore
+from .streaming import negotiate_media_type, coalesce_tokens, encode_event, NDJSON_MEDIA_TYPE
+from .resources import resource_config, effective_config
+from . import profiling
+from .scheduler import GenerationScheduler, QueueTimeout, PRIORITY_WEIGHTS, TRUSTED_API_KEYS
+from .degradation import LoadPolicy
 import os
 import time
 import json
+import math
+import threading
+import psutil
+from contextlib import nullcontext
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -27,60 +38,206 @@ app.add_middleware(
 # Initialize RAG
 rag = RAGPipeline()
 rag.load_vector_store()
+models_loaded_at = time.time()
 
 # Initialize Metrics
 metrics = MetricsManager()
 
+# Conversation sessions (in-memory, bounded)
+sessions = SessionStore()
+
+# Per-client quotas and weighted fair queueing for generation slots
+scheduler = GenerationScheduler()
+
+# Steps /chat down to shorter, extractive or cached answers while generation is backed up
+load_policy = LoadPolicy(scheduler.queue_depth)
+
+# /chat/batch limits: queries per request and sequences per padded generate() batch
+MAX_BATCH_QUERIES = int(os.getenv("DELORES_MAX_BATCH_QUERIES", "256"))
+MAX_GENERATION_BATCH = 16
+
+PRODUCT_IDS = sorted(set(TARGET_PRODUCTS.values()))
+
+def check_product(product):
+    if product is not None and product not in PRODUCT_IDS:
+        raise HTTPException(status_code=400, detail=f"product must be one of {PRODUCT_IDS}")
+
+def trusted_api_key(http_request):
+    """The X-API-Key header when it is on the DELORES_API_KEYS allow-list, else None."""
+    api_key = http_request.headers.get("x-api-key")
+    return api_key if api_key in TRUSTED_API_KEYS else None
+
+def client_id_for(http_request):
+    """Quota key: a trusted API key, else the client IP (made-up keys don't get a fresh bucket)."""
+    api_key = trusted_api_key(http_request)
+    if api_key:
+        return f"key:{api_key}"
+    return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+
+def admit_or_429(http_request, requested, endpoint_priority, cost=1):
+    """
+    Picks the scheduling class (the endpoint's own, unless a trusted key asks for another one)
+    and charges cost (one per query) to the client's quota. Returns the class.
+    """
+    priority = requested or endpoint_priority
+    if priority not in PRIORITY_WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {list(PRIORITY_WEIGHTS)}")
+    if priority != endpoint_priority and not trusted_api_key(http_request):
+        raise HTTPException(status_code=403, detail=f"Only trusted API keys may change the priority of this endpoint from '{endpoint_priority}'")
+    retry_after = scheduler.admit(client_id_for(http_request), priority, cost)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers={"Retry-After": str(math.ceil(retry_after))})
+    return priority
+
 class ChatRequest(BaseModel):
     query: str
     product: str | None = None
     language: str = "en"  # "en", "fr", "rw"
+    assist: str | None = None  # None, "prompt_lookup" or "draft" (assisted generation)
+    max_new_tokens: int | None = Field(None, ge=1, le=MAX_NEW_TOKENS)  # Defaults to a budget derived from the question type
+    # Extra stop sequences on top of the defaults ("" would stop before the first token)
+    stop: list[constr(min_length=1, max_length=MAX_STOP_SEQUENCE_LENGTH)] | None = Field(None, max_length=MAX_STOP_SEQUENCES)
+    session_id: str | None = None  # Returned in the metadata line; send it back for follow-ups
+    priority: str | None = None  # Scheduler class; "interactive" unless a trusted API key picks "batch" or "evaluation"
+    answer_mode: str = "generative"  # "extractive" returns the best-matching span of the sources, no LLM
+
+class BatchChatRequest(BaseModel):
+    queries: list[str]
+    product: str | None = None
+    language: str = "en"
+    max_new_tokens: int | None = Field(None, ge=1, le=MAX_NEW_TOKENS)
+    batch_size: int = Field(4, ge=1, le=MAX_GENERATION_BATCH)
+    priority: str | None = None  # "batch" unless a trusted API key picks another class
 
 class FeedbackRequest(BaseModel):
     request_id: str
     score: int  # 1-5
 
+@app.on_event("startup")
+async def apply_api_threads():
+    # Sync endpoints (/chat, /chat/batch) run in anyio's threadpool; cap it with DELORES_API_THREADS
+    api_threads = resource_config()["api_threads"]
+    if api_threads:
+        from anyio import to_thread
+        to_thread.current_default_thread_limiter().total_tokens = api_threads
+    print(f"🧵 CPU resources: {dict(effective_config(), api_threads=api_threads or 'default')}")
+
+# Cold start breakdown, reported once the warm-up has run (see GET /ready)
+startup_report = {"ready": False, "snapshot": snapshot.SNAPSHOT_DIR}
+
+@app.on_event("startup")
+def warm_up():
+    # Runs before uvicorn reports "Application startup complete", so replicas only take traffic warm
+    process_started_at = psutil.Process().create_time()
+    warmup_s = rag.warm_up() if os.getenv("DELORES_WARMUP", "1") == "1" else 0.0
+    startup_report.update(
+        ready=True,
+        index_version=rag.index_version,
+        load_s=models_loaded_at - process_started_at,
+        warmup_s=warmup_s,
+        cold_start_s=time.time() - process_started_at,
+    )
+    print(f"🚀 Ready in {startup_report['cold_start_s']:.1f}s (load {startup_report['load_s']:.1f}s, "
+          f"warm-up {warmup_s:.1f}s, snapshot: {snapshot.SNAPSHOT_DIR or 'none'})")
+
+@app.get("/ready")
+def ready():
+    return startup_report
+
 @app.get("/")
 def read_root():
     return {"status": "Delores Backend Running"}
 
 @app.post("/chat")
-def chat(request: ChatRequest):
+def chat(request: ChatRequest, http_request: Request):
     start_time = time.time()
     
+    if request.assist and request.assist not in ASSIST_MODES:
+        raise HTTPException(status_code=400, detail=f"assist must be one of {list(ASSIST_MODES)}")
+    if request.answer_mode not in ANSWER_MODES:
+        raise HTTPException(status_code=400, detail=f"answer_mode must be one of {list(ANSWER_MODES)}")
+    check_product(request.product)
+    priority = admit_or_429(http_request, request.priority, "interactive")
+    
+    # Framing is chosen by content negotiation: SSE, NDJSON, or the legacy text stream
+    media_type = negotiate_media_type(http_request.headers.get("accept"))
+    stop_sequences = DEFAULT_STOP_SEQUENCES + (request.stop or [])
+    try:
+        session_id = sessions.get_or_create(request.session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    history = sessions.history(session_id)
+    # Set when the client goes away so generation stops at the next decode step
+    cancel_event = threading.Event()
+    # Opt-in CPU profile of this request (header, ?profile=1, or DELORES_PROFILE_SAMPLE_RATE)
+    profiler = None
+    if profiling.should_profile(http_request.headers.get(profiling.PROFILE_HEADER), http_request.query_params.get("profile")):
+        profiler = profiling.SamplingProfiler().start()
+    
+    # Serving mode for this request, from the current queue depth and recent TTFTs
+    load_mode = load_policy.mode()
+    
     # We will capture data in the generator to log after streaming finishes
-    def content_generator():
+    def chat_events():
         ttft = None
         full_response = []
         sources = []
+        chunks = 0
         
         # Generator from RAG
-        stream = rag.answer_query_stream(request.query, request.language)
+        stream = rag.answer_query_stream(
+            request.query,
+            request.language,
+            assist=request.assist,
+            max_new_tokens=request.max_new_tokens,
+            stop_sequences=stop_sequences,
+            cancel_event=cancel_event,
+            product=request.product,
+            history=history,
+            mode=load_mode,
+            answer_mode=request.answer_mode
+        )
         
         # 1. First chunk is metadata
         try:
-            metadata_json = next(stream)
-            yield metadata_json
-            
-            # Parse metadata to store for logging
-            meta_dict = json.loads(metadata_json)
-            sources.extend(meta_dict.get("sources", []))
-            
+            meta_dict = json.loads(next(stream))
         except StopIteration:
-            pass
-            
-        # 2. Stream tokens
-        for token in stream:
-            if ttft is None:
-                ttft = (time.time() - start_time) * 1000  # ms
+            meta_dict = {}
+        retrieval_ms = (time.time() - start_time) * 1000
+        
+        # Keep for logging, and tell the client its session
+        sources.extend(meta_dict.get("sources", []))
+        meta_dict["session_id"] = session_id
+        yield dict(meta_dict, type="meta")
             
-            full_response.append(token)
-            yield token
+        # 2. Stream tokens (coalesced, with heartbeats while the model is silent).
+        # Generation waits for a scheduler slot; templated, extractive and cached replies don't need one.
+        needs_slot = meta_dict.get("answer_mode") == "generative"
+        try:
+            with scheduler.slot(priority) if needs_slot else nullcontext():
+                for event in coalesce_tokens(stream):
+                    if event["type"] == "token":
+                        if ttft is None:
+                            ttft = (time.time() - start_time) * 1000  # ms
+                        full_response.append(event["text"])
+                        chunks += 1
+                    yield event
+        except QueueTimeout as e:
+            yield {"type": "error", "detail": str(e)}
+        finally:
+            # On client disconnect (GeneratorExit) this stops llm_model.generate instead of
+            # decoding the remaining budget for nobody.
+            cancel_event.set()
             
         # 3. Log Interaction after stream ends
         end_time = time.time()
         latency_ms = (end_time - start_time) * 1000
+        if needs_slot and ttft is not None:
+            load_policy.record_ttft(ttft)
         response_text = "".join(full_response)
+        # A request that produced nothing (e.g. no slot in time) is not a conversation turn
+        if response_text:
+            sessions.add_turn(session_id, request.query, response_text)
         
         # Log to DB
         req_id = metrics.log_interaction(
@@ -88,29 +245,103 @@ def chat(request: ChatRequest):
             response=response_text,
             sources=sources,
             latency_ms=latency_ms,
-            ttft_ms=ttft if ttft else 0.0
+            ttft_ms=ttft if ttft else 0.0,
+            top_score=meta_dict.get("top_score"),
+            answer_mode=meta_dict.get("answer_mode"),
+            load_mode=load_mode
         )
         
-        # Optionally yield the request_id as a final event or log it server-side
-        # For now, we can print it or handle it. 
-        # Ideally, we should send it to the client in the first metadata chunk, 
-        # but since that comes from RAG, we might need to refactor. 
-        # For simplicity, we assume client can't see ID yet unless we modify RAG. 
-        # ACTUALLY: Let's refactor slightly to generate ID here (or return it in a header if we weren't streaming).
-        # Since we are streaming, we can append a special footer or just log it for internal use.
-        # BUT: The user needs the ID to send feedback. 
-        # FIX: We will yield a final chunk with the ID.
+        end_event = {
+            "type": "end",
+            "request_id": req_id,
+            "timings": {"retrieval_ms": retrieval_ms, "ttft_ms": ttft or 0.0, "latency_ms": latency_ms},
+        }
+        if profiler is not None:
+            profiler.stop()
+            metrics.save_profile(req_id, profiler.collapsed(), profiler.interval * 1000,
+                                 profiler.duration * 1000, sum(profiler.samples.values()))
+            end_event["profile_url"] = f"/profiles/{req_id}"
         
-        final_meta = json.dumps({"request_id": req_id, "type": "end_event"})
-        yield f"\n\n__METADATA_END__:{final_meta}"
+        yield {"type": "usage", "output_chars": len(response_text), "chunks": chunks}
+        # The client needs the request_id to send feedback
+        yield end_event
+
+    def content_generator():
+        events = chat_events()
+        try:
+            while True:
+                # Threadpool threads are shared, so each one is only sampled while it runs this request
+                with profiling.attached(profiler, "request"):
+                    event = next(events, None)
+                if event is None:
+                    break
+                frame = encode_event(event, media_type)
+                if frame:
+                    yield frame
+        finally:
+            events.close()
+            if profiler is not None:
+                profiler.stop()
 
     return StreamingResponse(
         content_generator(), 
-        media_type="text/plain"
+        media_type=media_type,
+        # Stop reverse proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@app.post("/chat/batch")
+def chat_batch(request: BatchChatRequest, http_request: Request):
+    """Bulk answering for offline jobs. Streams one NDJSON result per query as batches complete."""
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per request")
+    check_product(request.product)
+    priority = admit_or_429(http_request, request.priority, "batch", cost=len(request.queries))
+    
+    def result_generator():
+        # Each generate_batch call holds one scheduler slot; reading finished results doesn't
+        results = rag.iter_answer_batch(
+            request.queries,
+            language=request.language,
+            product=request.product,
+            max_new_tokens=request.max_new_tokens,
+            batch_size=request.batch_size,
+            generation_slot=lambda: scheduler.slot(priority)
+        )
+        index = 0
+        try:
+            for result in results:
+                yield json.dumps(dict(result, index=index)) + "\n"
+                index += 1
+        except QueueTimeout as e:
+            # Everything before index was already sent; the rest didn't get a slot in time
+            yield json.dumps({"index": index, "error": str(e)}) + "\n"
+    
+    return StreamingResponse(result_generator(), media_type=NDJSON_MEDIA_TYPE)
+
+@app.get("/profiles/{request_id}")
+def get_profile(request_id: str, format: str = "collapsed"):
+    """Stored request profile as collapsed stacks (flamegraph.pl, speedscope) or speedscope JSON."""
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'speedscope'")
+    profile = metrics.get_profile(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile for this request_id")
+    if format == "speedscope":
+        return profiling.collapsed_to_speedscope(profile["collapsed"], request_id, profile["interval_ms"] / 1000)
+    return PlainTextResponse(profile["collapsed"])
+
+@app.get("/scheduler")
+async def scheduler_stats():
+    """Per-class queue depth, active generations, dispatch/reject counts and queue wait percentiles."""
+    return dict(scheduler.stats(), load_policy=load_policy.stats(), answer_cache=rag.answer_cache.stats())
+
+# async: a single quick SQLite write, served on the event loop instead of waiting for a
+# threadpool thread behind queued /chat generations
 @app.post("/feedback")
-def feedback(request: FeedbackRequest):
+async def feedback(request: FeedbackRequest):
     try:
         metrics.update_feedback(request.request_id, request.score)
         return {"status": "Feedback received"}
@@ -0,0 +1,114 @@
+import os
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+
+# In-memory conversation state. Memory is bounded on every axis:
+# number of sessions (LRU), idle time (TTL), turns per session and characters per turn.
+MAX_SESSIONS = int(os.getenv("DELORES_MAX_SESSIONS", "5000"))
+SESSION_TTL_SECONDS = int(os.getenv("DELORES_SESSION_TTL", "1800"))
+MAX_TURNS = int(os.getenv("DELORES_SESSION_TURNS", "4"))
+MAX_CHARS_PER_TURN = 600
+
+# History budget in the prompt, in characters (~4 chars per TinyLlama token)
+HISTORY_CHAR_BUDGET = 1200
+
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(and|also|what about|how about|then|so|et|aussi|et pour|na|ese)\b|\b(it|its|that|this|those|these|they|them|there|ça|cela|il|elle)\b",
+    re.IGNORECASE
+)
+
+def is_session_id(value):
+    try:
+        return str(uuid.UUID(value)) == value
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+class SessionStore:
+    """Thread-safe, size-bounded session store with TTL eviction (least recently used first)."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl_seconds=SESSION_TTL_SECONDS, max_turns=MAX_TURNS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self._sessions = OrderedDict()  # session_id -> (last_seen, deque of (query, answer))
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Oldest entries are at the front, so expired sessions are always a prefix
+        while self._sessions:
+            session_id, (last_seen, _) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def get_or_create(self, session_id=None):
+        """
+        Returns a live session id. Unknown or expired ids get a new server-issued id, so clients
+        can't choose their own; ids that aren't UUIDs raise ValueError.
+        """
+        if session_id is not None and not is_session_id(session_id):
+            raise ValueError("session_id must be a UUID returned by the server")
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            if session_id not in self._sessions:
+                session_id = str(uuid.uuid4())
+                self._sessions[session_id] = (now, deque(maxlen=self.max_turns))
+                self._evict(now)
+            else:
+                _, turns = self._sessions[session_id]
+                self._sessions[session_id] = (now, turns)
+                self._sessions.move_to_end(session_id)
+            return session_id
+
+    def history(self, session_id):
+        """List of (query, answer) turns, oldest first."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return list(entry[1]) if entry else []
+
+    def add_turn(self, session_id, query, answer):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            turns = entry[1]
+            turns.append((query[:MAX_CHARS_PER_TURN], answer[:MAX_CHARS_PER_TURN]))
+            self._sessions[session_id] = (now, turns)
+            self._sessions.move_to_end(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+def is_follow_up(query):
+    return len(query.split()) <= 4 or bool(FOLLOW_UP_PATTERN.search(query))
+
+def condense_query(query, history):
+    """
+    Standalone retrieval query for a follow-up ("and how much does it cost?"),
+    built by anchoring it to the previous question. No LLM call.
+    """
+    if not history or not is_follow_up(query):
+        return query
+    previous_query = history[-1][0]
+    return f"{previous_query} {query}"
+
+def format_history(history, char_budget=HISTORY_CHAR_BUDGET):
+    """Most recent turns that fit in the budget, rendered oldest first."""
+    lines = []
+    used = 0
+    for query, answer in reversed(history):
+        turn = f"User: {query}\nDelores: {answer}"
+        if used + len(turn) > char_budget:
+            if not lines:
+                # The latest turn alone is over budget: keep its start rather than no history at all
+                lines.append(turn[:char_budget])
+            break
+        lines.append(turn)
+        used += len(turn)
+    return "\n".join(reversed(lines))
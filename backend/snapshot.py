@@ -0,0 +1,45 @@
+import os
+import json
+
+# Serving snapshot written by prepare_snapshot.py: local copies of every model (safetensors +
+# fast tokenizer) and of the FAISS index, described by snapshot.json. With DELORES_SNAPSHOT set,
+# models load from those paths and the Hugging Face hub is never contacted.
+# Imported before transformers/huggingface_hub so the offline flags take effect.
+
+SNAPSHOT_DIR = os.getenv("DELORES_SNAPSHOT")
+SNAPSHOT_FILE = "snapshot.json"
+
+# Model roles -> hub ids used when there is no snapshot
+MODEL_IDS = {
+    "vision": "Salesforce/blip-image-captioning-base",
+    "embedding": "sentence-transformers/all-MiniLM-L6-v2",
+    "llm": "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+    # Assisted generation draft model (only loaded with assist="draft")
+    "draft": os.getenv("DELORES_DRAFT_MODEL", "JackFram/llama-68m"),
+}
+
+def load_manifest(snapshot_dir=SNAPSHOT_DIR):
+    if not snapshot_dir:
+        return None
+    path = os.path.join(snapshot_dir, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"DELORES_SNAPSHOT={snapshot_dir} has no {SNAPSHOT_FILE}; run prepare_snapshot.py first")
+    with open(path, "r") as f:
+        return json.load(f)
+
+SNAPSHOT = load_manifest()
+
+if SNAPSHOT:
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+def model_path(role, default=None):
+    """Local snapshot directory for a model role, or its hub id."""
+    if SNAPSHOT and role in SNAPSHOT["models"]:
+        return os.path.join(SNAPSHOT_DIR, SNAPSHOT["models"][role]["path"])
+    return default or MODEL_IDS[role]
+
+def index_path(default="faiss_index"):
+    if SNAPSHOT and SNAPSHOT.get("index_path"):
+        return os.path.join(SNAPSHOT_DIR, SNAPSHOT["index_path"])
+    return default
@@ -0,0 +1,113 @@
+import json
+import queue
+import time
+import threading
+
+from . import profiling
+
+# Framing for the /chat stream. Events are dicts with a "type":
+#   meta (sources, language, session_id), token (text), usage, end (request_id, timings), heartbeat,
+#   error (detail, e.g. no generation slot in time)
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+LEGACY_MEDIA_TYPE = "text/plain"
+
+# Tokens are coalesced until this many characters or this much time has passed
+COALESCE_MAX_CHARS = 24
+COALESCE_MAX_DELAY = 0.05  # seconds
+# Keep-alive frame when nothing has been sent for this long (proxies drop idle streams)
+HEARTBEAT_INTERVAL = 10.0  # seconds
+
+_DONE = object()
+
+def negotiate_media_type(accept_header):
+    """Picks the stream framing from the Accept header; anything else keeps the legacy text stream."""
+    accept = (accept_header or "").lower()
+    if SSE_MEDIA_TYPE in accept:
+        return SSE_MEDIA_TYPE
+    if NDJSON_MEDIA_TYPE in accept or "application/jsonl" in accept:
+        return NDJSON_MEDIA_TYPE
+    return LEGACY_MEDIA_TYPE
+
+def coalesce_tokens(tokens, max_chars=COALESCE_MAX_CHARS, max_delay=COALESCE_MAX_DELAY,
+                    heartbeat_interval=HEARTBEAT_INTERVAL):
+    """
+    Yields {"type": "token"} events with several tokens merged per frame, and
+    {"type": "heartbeat"} events while the model is silent.
+    The source iterator is drained on a background thread so waiting on it never blocks a heartbeat.
+    """
+    items = queue.Queue()
+    stop = threading.Event()
+
+    def pump():
+        try:
+            for token in tokens:
+                if stop.is_set():
+                    break
+                items.put(token)
+        except Exception as e:
+            items.put(e)
+        finally:
+            # Close on the thread that iterated it (generators can't be closed from another thread mid-next)
+            if hasattr(tokens, "close"):
+                tokens.close()
+            items.put(_DONE)
+
+    threading.Thread(target=profiling.propagate(pump, "pump"), daemon=True).start()
+
+    buffer, buffer_chars, buffer_started = [], 0, None
+    last_sent = time.monotonic()
+    try:
+        while True:
+            now = time.monotonic()
+            if buffer:
+                timeout = max(0.0, max_delay - (now - buffer_started))
+            else:
+                timeout = max(0.0, heartbeat_interval - (now - last_sent))
+            try:
+                item = items.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            now = time.monotonic()
+            if item:
+                if not buffer:
+                    buffer_started = now
+                buffer.append(item)
+                buffer_chars += len(item)
+
+            if buffer and (buffer_chars >= max_chars or now - buffer_started >= max_delay):
+                yield {"type": "token", "text": "".join(buffer)}
+                buffer, buffer_chars = [], 0
+                last_sent = now
+            elif not buffer and now - last_sent >= heartbeat_interval:
+                yield {"type": "heartbeat"}
+                last_sent = now
+
+        if buffer:
+            yield {"type": "token", "text": "".join(buffer)}
+    finally:
+        stop.set()
+
+def encode_event(event, media_type):
+    """Serialises one event for the negotiated framing ("" means: nothing to send)."""
+    if media_type == NDJSON_MEDIA_TYPE:
+        return json.dumps(event) + "\n"
+    if media_type == SSE_MEDIA_TYPE:
+        payload = {k: v for k, v in event.items() if k != "type"}
+        return f"event: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+
+    # Legacy text/plain: metadata JSON line, raw token text, then the end sentinel
+    if event["type"] == "meta":
+        return json.dumps({k: v for k, v in event.items() if k != "type"}) + "\n"
+    if event["type"] == "token":
+        return event["text"]
+    if event["type"] == "end":
+        final_meta = json.dumps({"request_id": event["request_id"], "type": "end_event"})
+        return f"\n\n__METADATA_END__:{final_meta}"
+    return ""
@@ -0,0 +1,100 @@
+import os
+import sys
+import random
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+# Add repo root to path to allow importing backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.dedup import (
+    simhash, hamming, dedup_documents, to_sqlite, from_sqlite, _bands,
+    SIMHASH_THRESHOLD, BANDS, BAND_BITS, FINGERPRINT_MASK,
+)
+
+WORDS = ("passport renew apply service form photo fee pay mobile money bank card sms collect office "
+         "identity certificate birth marriage driving licence permit visa tax online account").split()
+
+def doc(text, source, product=None):
+    metadata = {"source": source}
+    if product:
+        metadata["product"] = product
+    return SimpleNamespace(page_content=text, metadata=metadata)
+
+@pytest.fixture(scope="module")
+def high_bit_pair():
+    """A near-duplicate pair (distinct fingerprints within the threshold) with bit 63 set in both."""
+    for seed in range(10000):
+        text = " ".join(random.Random(seed).choices(WORDS, k=60))
+        variant = text + " thanks"
+        a, b = simhash(text), simhash(variant)
+        if a >> 63 and b >> 63 and a != b and hamming(a, b) <= SIMHASH_THRESHOLD:
+            return text, variant, a, b
+    pytest.fail("no near-duplicate pair with bit 63 set")
+
+def test_fingerprints_are_unsigned(high_bit_pair):
+    _, _, a, b = high_bit_pair
+    assert 0 <= a <= FINGERPRINT_MASK and 0 <= b <= FINGERPRINT_MASK
+
+def test_empty_text_fingerprint():
+    assert simhash("") == 0
+
+def test_hamming_ignores_bits_above_64():
+    assert hamming(1 << 64, 0) == 0
+    assert hamming(1 << 63, 0) == 1
+
+def test_near_duplicates_share_a_band():
+    # Up to BANDS - 1 differing bits can touch at most BANDS - 1 bands
+    base = random.Random(0).getrandbits(64)
+    for flipped in ([0], [0, BAND_BITS], [0, BAND_BITS, 2 * BAND_BITS], [63, 62, 61]):
+        other = base
+        for bit in flipped:
+            other ^= 1 << bit
+        assert set(_bands(base)) & set(_bands(other))
+    assert SIMHASH_THRESHOLD < BANDS
+
+def test_near_duplicates_merged_at_default_threshold(high_bit_pair):
+    text, variant, _, _ = high_bit_pair
+    kept, dropped = dedup_documents([doc(text, "https://example.com/0"), doc(variant, "https://example.com/1")])
+    assert dropped == 1
+    assert kept[0].page_content == text
+    assert kept[0].metadata["source_urls"] == ["https://example.com/0", "https://example.com/1"]
+
+def test_threshold_is_respected(high_bit_pair):
+    text, variant, a, b = high_bit_pair
+    kept, dropped = dedup_documents([doc(text, "https://example.com/0"), doc(variant, "https://example.com/1")],
+                                    threshold=hamming(a, b) - 1)
+    assert dropped == 0 and len(kept) == 2
+
+def test_unrelated_texts_kept():
+    texts = [" ".join(random.Random(seed).choices(WORDS, k=60)) for seed in range(5)]
+    kept, dropped = dedup_documents([doc(t, f"https://example.com/{i}") for i, t in enumerate(texts)])
+    assert dropped == 0 and len(kept) == 5
+
+def test_near_duplicate_chunks_merge_products(high_bit_pair):
+    text, variant, _, _ = high_bit_pair
+    chunks = [
+        doc(text, "https://iremboagent.freshdesk.com/support/solutions/articles/1", product="IremboGov"),
+        doc(variant, "https://osc.freshdesk.com/support/solutions/articles/1", product="OSC"),
+        doc(text, "https://iremboagent.freshdesk.com/support/solutions/articles/1", product="IremboGov"),
+    ]
+    for i, chunk in enumerate(chunks):
+        chunk.metadata["chunk_index"] = i
+    kept, dropped = dedup_documents(chunks)
+    assert dropped == 2
+    assert kept[0].metadata["source_urls"] == ["https://iremboagent.freshdesk.com/support/solutions/articles/1", "https://osc.freshdesk.com/support/solutions/articles/1"]
+    assert kept[0].metadata["products"] == ["IremboGov", "OSC"]
+
+def test_sqlite_round_trip(high_bit_pair):
+    _, _, a, b = high_bit_pair
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE fingerprints (id INTEGER PRIMARY KEY, fingerprint INTEGER)")
+    with pytest.raises(OverflowError):
+        conn.execute("INSERT INTO fingerprints (fingerprint) VALUES (?)", (a,))
+    conn.executemany("INSERT INTO fingerprints (fingerprint) VALUES (?)", [(to_sqlite(a),), (to_sqlite(b),), (to_sqlite(5),)])
+    stored = [from_sqlite(v) for (v,) in conn.execute("SELECT fingerprint FROM fingerprints ORDER BY id")]
+    conn.close()
+    assert stored == [a, b, 5]
+    assert hamming(stored[0], stored[1]) == hamming(a, b)
@@ -0,0 +1,34 @@
+import os
+import sys
+
+# Add repo root to path to allow importing backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.degradation import LoadPolicy
+
+def policy(**kwargs):
+    return LoadPolicy(lambda: 0, queue_thresholds=(2, 6, 12), ttft_thresholds=(3000, 8000, 15000),
+                      recovery_seconds=0, enabled=True, **kwargs)
+
+def test_single_slow_answer_does_not_degrade():
+    load = policy(ttft_min_samples=5)
+    load.record_ttft(20000)
+    assert load.mode() == "normal"
+    assert load.stats()["recent_ttft_ms"] == 0.0
+
+def test_slow_answers_degrade_once_enough_samples():
+    load = policy(ttft_min_samples=5)
+    for _ in range(5):
+        load.record_ttft(9000)
+    assert load.mode() == "extractive"
+
+def test_recovers_when_samples_thin_out():
+    load = policy(ttft_min_samples=3)
+    for _ in range(3):
+        load.record_ttft(9000)
+    assert load.mode() == "extractive"
+    # Samples leave the window while degraded; the policy must be able to step back up
+    load._ttfts.popleft()
+    assert load.mode() == "extractive"  # calm period starts
+    assert load.mode() == "short"
+    assert load.mode() == "normal"
@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+# Add repo root to path to allow importing backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.fake_llm_server import FakeCompletionsHandler, REPLY
+from backend.generation import OpenAICompatibleBackend
+
+# max_new_tokens is always passed, so the backend never imports local_model (and its models)
+BUDGET = 64
+
+def start_fake_server(token_delay=0.0):
+    handler = type("Handler", (FakeCompletionsHandler,), {"token_delay": token_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(token_delay=0.0):
+        server, url = start_fake_server(token_delay)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_generate(fake_server):
+    backend = OpenAICompatibleBackend(base_url=fake_server())
+    assert backend.generate("Question: how do I apply?", max_new_tokens=BUDGET) == REPLY
+
+def test_generate_respects_budget(fake_server):
+    backend = OpenAICompatibleBackend(base_url=fake_server())
+    assert backend.generate("Question: hi", max_new_tokens=3) == " ".join(REPLY.split(" ")[:3])
+
+def test_generate_stream(fake_server):
+    backend = OpenAICompatibleBackend(base_url=fake_server())
+    pieces = list(backend.generate_stream("Question: how do I apply?", max_new_tokens=BUDGET))
+    assert len(pieces) == len(REPLY.split(" "))
+    assert "".join(pieces) == REPLY
+
+def test_generate_stream_cancel(fake_server):
+    backend = OpenAICompatibleBackend(base_url=fake_server(token_delay=0.01))
+    cancel_event = threading.Event()
+    pieces = []
+    for piece in backend.generate_stream("Question: hi", max_new_tokens=BUDGET, cancel_event=cancel_event):
+        pieces.append(piece)
+        if len(pieces) == 2:
+            cancel_event.set()
+    assert len(pieces) == 2
+
+def test_generate_stream_close_sets_cancel_event(fake_server):
+    backend = OpenAICompatibleBackend(base_url=fake_server(token_delay=0.01))
+    cancel_event = threading.Event()
+    stream = backend.generate_stream("Question: hi", max_new_tokens=BUDGET, cancel_event=cancel_event)
+    next(stream)
+    stream.close()  # client disconnect
+    assert cancel_event.is_set()
+
+def test_generate_read_timeout(fake_server):
+    backend = OpenAICompatibleBackend(base_url=fake_server(token_delay=0.2), read_timeout=0.1)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        backend.generate("Question: hi", max_new_tokens=BUDGET)
+
+def test_generate_stream_read_timeout(fake_server):
+    # The timeout bounds the gap between two chunks
+    backend = OpenAICompatibleBackend(base_url=fake_server(token_delay=0.3), read_timeout=0.1)
+    with pytest.raises(requests.exceptions.RequestException):
+        list(backend.generate_stream("Question: hi", max_new_tokens=BUDGET))
+
+def test_generate_batch(fake_server):
+    backend = OpenAICompatibleBackend(base_url=fake_server())
+    assert backend.generate_batch(["Question: a", "Question: b", "Question: c"], max_new_tokens=BUDGET, batch_size=2) == [REPLY] * 3
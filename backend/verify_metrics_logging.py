@@ -13,25 +13,25 @@ def verify_logging():
     
     # 1. Send Chat Request
     print("   1. Sending Chat Request...")
-    response = requests.post(f"{BASE_URL}/chat", json={"query": "Hello", "language": "en"}, stream=True)
+    response = requests.post(
+        f"{BASE_URL}/chat",
+        json={"query": "Hello", "language": "en"},
+        headers={"Accept": "application/x-ndjson"},
+        stream=True
+    )
     
     request_id = None
     response_text = ""
     
+    # One JSON event per line: meta, token..., usage, end
     for line in response.iter_lines():
-        if line:
-            decoded_line = line.decode('utf-8')
-            response_text += decoded_line
-            # Look for metadata end event
-            if "__METADATA_END__" in decoded_line:
-                # Format is usually __METADATA_END__:{json}
-                try:
-                    parts = decoded_line.split("__METADATA_END__:")
-                    if len(parts) > 1:
-                        meta = json.loads(parts[1])
-                        request_id = meta.get("request_id")
-                except:
-                    pass
+        if not line:
+            continue
+        event = json.loads(line)
+        if event["type"] == "token":
+            response_text += event["text"]
+        elif event["type"] == "end":
+            request_id = event.get("request_id")
 
     if not request_id:
         print("   ❌ Failed to capture request_id from stream.")
@@ -21,6 +21,7 @@ const ChatInterface = () => {
   const [selectedProduct, setSelectedProduct] = useState(null);
   const [selectedLanguage, setSelectedLanguage] = useState('en');
   const [isLoading, setIsLoading] = useState(false);
+  const [sessionId, setSessionId] = useState(null);
   const [showProductMenu, setShowProductMenu] = useState(false);
   const [showLanguageMenu, setShowLanguageMenu] = useState(false);
 
@@ -67,30 +68,62 @@ const ChatInterface = () => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          Accept: 'application/x-ndjson',
         },
         body: JSON.stringify({
           query: inputText,
           product: selectedProduct,
           language: selectedLanguage,
+          session_id: sessionId,
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to get response');
       }
 
-      const data = await response.json();
-
-      const botMessage = {
-        id: (Date.now() + 1).toString(),
+      const botId = (Date.now() + 1).toString();
+      setMessages(prev => [...prev, {
+        id: botId,
         type: 'bot',
-        content: data.response,
-        sources: data.sources,
-        language: data.language,
-        timestamp: data.timestamp || new Date().toISOString(),
-      };
-
-      setMessages(prev => [...prev, botMessage]);
+        content: '',
+        sources: [],
+        language: selectedLanguage,
+        timestamp: new Date().toISOString(),
+      }]);
+      const updateBot = (patch) => setMessages(prev => prev.map(m => (
+        m.id === botId ? { ...m, ...(typeof patch === 'function' ? patch(m) : patch) } : m
+      )));
+
+      // NDJSON stream: one typed event per line (meta, token, usage, end, heartbeat, error)
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === 'meta') {
+            if (event.session_id) setSessionId(event.session_id);
+            updateBot({ sources: event.sources || [], language: event.language || selectedLanguage });
+          } else if (event.type === 'token') {
+            updateBot(m => ({ content: m.content + event.text }));
+          } else if (event.type === 'error') {
+            // e.g. no generation slot in time: keep any partial text, otherwise explain
+            updateBot(m => ({
+              content: m.content || 'The assistant is busy right now. Please try again in a moment.',
+              isError: true,
+            }));
+          } else if (event.type === 'end') {
+            updateBot({ requestId: event.request_id });
+          }
+        }
+      }
     } catch (error) {
       console.error('Error:', error);
 
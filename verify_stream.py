@@ -11,7 +11,8 @@ def verify_stream():
     
     print(f"Sending request to {url}...")
     try:
-        with requests.post(url, json=payload, stream=True) as response:
+        headers = {"Accept": "application/x-ndjson"}
+        with requests.post(url, json=payload, headers=headers, stream=True) as response:
             if response.status_code != 200:
                 print(f"Error: {response.status_code}")
                 print(response.text)
@@ -20,22 +21,17 @@ def verify_stream():
             print("Response stream started:")
             print("-" * 20)
             
-            first_chunk = True
-            for chunk in response.iter_content(chunk_size=None):
-                if chunk:
-                    text = chunk.decode('utf-8')
-                    if first_chunk:
-                        print(f"METADATA: {text.strip()}")
-                        first_chunk = False
-                        # Try parsing metadata
-                        try:
-                            meta = json.loads(text)
-                            print(f"  Sources: {len(meta.get('sources', []))}")
-                        except:
-                            print("  (Could not parse metadata JSON)")
-                    else:
-                        sys.stdout.write(text)
-                        sys.stdout.flush()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "meta":
+                    print(f"METADATA: Sources: {len(event.get('sources', []))}")
+                elif event["type"] == "token":
+                    sys.stdout.write(event["text"])
+                    sys.stdout.flush()
+                elif event["type"] == "end":
+                    print(f"\nEND: request_id={event['request_id']} timings={event['timings']}")
             
             print("\n" + "-" * 20)
             print("Stream finished.")